@@ -1,8 +1,42 @@
 import gi
 import os
 import math
+import bisect
+import base64
+import hashlib
+import heapq
+import itertools
+import json
+import pickle
+import queue
+import random
+import re
+import shutil
+import socket
+import stat
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from array import array
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+import cairo
 gi.require_version("Gtk", "3.0")
-from gi.repository import Gtk, Gdk, GdkPixbuf, Pango, GLib
+from gi.repository import Gtk, Gdk, GdkPixbuf, Pango, GLib, GObject
+
+# Optional vector importers: SVG through librsvg, PDF through poppler-glib
+try:
+    gi.require_version("Rsvg", "2.0")
+    from gi.repository import Rsvg
+except (ValueError, ImportError):
+    Rsvg = None
+try:
+    gi.require_version("Poppler", "0.18")
+    from gi.repository import Poppler
+except (ValueError, ImportError):
+    Poppler = None
 
 
 def catmull_rom_spline(points, num_segments=10):
@@ -17,8 +51,22 @@ def catmull_rom_spline(points, num_segments=10):
 
     # Add first point
     smoothed.append(points[0])
+    smoothed.extend(catmull_rom_segments(points, 0, len(points) - 3, num_segments))
+
+    # Add last two points
+    smoothed.append(points[-2])
+    smoothed.append(points[-1])
+
+    return smoothed
+
 
-    for i in range(len(points) - 3):
+def catmull_rom_segments(points, start, end, num_segments=10):
+    """
+    Interpolated points of the spline segments start to end (exclusive),
+    segment i running from points[i + 1] to points[i + 2].
+    """
+    smoothed = []
+    for i in range(start, end):
         p0 = points[i]
         p1 = points[i + 1]
         p2 = points[i + 2]
@@ -42,14 +90,1636 @@ def catmull_rom_spline(points, num_segments=10):
 
             smoothed.append((x, y))
 
-    # Add last two points
-    smoothed.append(points[-2])
-    smoothed.append(points[-1])
-
     return smoothed
 
 
+def _normalize(dx, dy):
+    length = math.hypot(dx, dy)
+    if length == 0:
+        return 0.0, 0.0
+    return dx / length, dy / length
+
+
+def _bezier_at(p0, c1, c2, p3, t):
+    mt = 1 - t
+    b0, b1, b2, b3 = mt * mt * mt, 3 * mt * mt * t, 3 * mt * t * t, t * t * t
+    return (b0 * p0[0] + b1 * c1[0] + b2 * c2[0] + b3 * p3[0],
+            b0 * p0[1] + b1 * c1[1] + b2 * c2[1] + b3 * p3[1])
+
+
+def _generate_bezier(points, u, tan1, tan2):
+    """Least-squares control points for a segment with fixed end tangents."""
+    p0, p3 = points[0], points[-1]
+    c00 = c01 = c11 = x0 = x1 = 0.0
+    for p, t in zip(points, u):
+        mt = 1 - t
+        b0, b1, b2, b3 = mt * mt * mt, 3 * mt * mt * t, 3 * mt * t * t, t * t * t
+        a0x, a0y = tan1[0] * b1, tan1[1] * b1
+        a1x, a1y = tan2[0] * b2, tan2[1] * b2
+        c00 += a0x * a0x + a0y * a0y
+        c01 += a0x * a1x + a0y * a1y
+        c11 += a1x * a1x + a1y * a1y
+        tx = p[0] - (p0[0] * (b0 + b1) + p3[0] * (b2 + b3))
+        ty = p[1] - (p0[1] * (b0 + b1) + p3[1] * (b2 + b3))
+        x0 += a0x * tx + a0y * ty
+        x1 += a1x * tx + a1y * ty
+
+    det = c00 * c11 - c01 * c01
+    seg_length = math.hypot(p3[0] - p0[0], p3[1] - p0[1])
+    alpha1 = alpha2 = 0.0
+    if det != 0:
+        alpha1 = (x0 * c11 - x1 * c01) / det
+        alpha2 = (c00 * x1 - c01 * x0) / det
+    epsilon = 1e-6 * seg_length
+    if alpha1 < epsilon or alpha2 < epsilon:
+        # Degenerate fit: fall back to the Wu/Barsky heuristic
+        alpha1 = alpha2 = seg_length / 3
+
+    return (p0,
+            (p0[0] + tan1[0] * alpha1, p0[1] + tan1[1] * alpha1),
+            (p3[0] + tan2[0] * alpha2, p3[1] + tan2[1] * alpha2),
+            p3)
+
+
+def _max_error(points, bezier, u):
+    """Largest squared distance between the points and the curve, and its index."""
+    max_dist, split = 0.0, len(points) // 2
+    for i in range(1, len(points) - 1):
+        x, y = _bezier_at(*bezier, u[i])
+        dist = (x - points[i][0]) ** 2 + (y - points[i][1]) ** 2
+        if dist >= max_dist:
+            max_dist, split = dist, i
+    return max_dist, split
+
+
+def _reparameterize(points, bezier, u):
+    """One Newton-Raphson step towards each point's closest parameter on the curve."""
+    p0, c1, c2, p3 = bezier
+    result = []
+    for p, t in zip(points, u):
+        mt = 1 - t
+        qx, qy = _bezier_at(p0, c1, c2, p3, t)
+        # First and second derivatives
+        d1x = 3 * (mt * mt * (c1[0] - p0[0]) + 2 * mt * t * (c2[0] - c1[0]) + t * t * (p3[0] - c2[0]))
+        d1y = 3 * (mt * mt * (c1[1] - p0[1]) + 2 * mt * t * (c2[1] - c1[1]) + t * t * (p3[1] - c2[1]))
+        d2x = 6 * (mt * (c2[0] - 2 * c1[0] + p0[0]) + t * (p3[0] - 2 * c2[0] + c1[0]))
+        d2y = 6 * (mt * (c2[1] - 2 * c1[1] + p0[1]) + t * (p3[1] - 2 * c2[1] + c1[1]))
+        numerator = (qx - p[0]) * d1x + (qy - p[1]) * d1y
+        denominator = d1x * d1x + d1y * d1y + (qx - p[0]) * d2x + (qy - p[1]) * d2y
+        result.append(t if denominator == 0 else min(max(t - numerator / denominator, 0.0), 1.0))
+    return result
+
+
+def fit_bezier(points, tolerance):
+    """
+    Fit points with a chain of cubic Bezier segments (Schneider's algorithm),
+    each within tolerance of the points it replaces.
+    Returns a flat array: start x, y, then c1, c2 and end point per segment.
+    """
+    pts = [points[0]]
+    for p in points[1:]:
+        if p != pts[-1]:
+            pts.append(p)
+    if len(pts) < 2:
+        return None
+
+    error = tolerance * tolerance
+    curves = array('d', pts[0])
+    # Explicit stack instead of recursion, right half pushed first so
+    # segments come out in order
+    stack = [(0, len(pts) - 1,
+              _normalize(pts[1][0] - pts[0][0], pts[1][1] - pts[0][1]),
+              _normalize(pts[-2][0] - pts[-1][0], pts[-2][1] - pts[-1][1]))]
+    while stack:
+        first, last, tan1, tan2 = stack.pop()
+        segment = pts[first:last + 1]
+
+        if len(segment) == 2:
+            dist = math.hypot(segment[1][0] - segment[0][0], segment[1][1] - segment[0][1]) / 3
+            bezier = (segment[0],
+                      (segment[0][0] + tan1[0] * dist, segment[0][1] + tan1[1] * dist),
+                      (segment[1][0] + tan2[0] * dist, segment[1][1] + tan2[1] * dist),
+                      segment[1])
+            curves.extend(bezier[1] + bezier[2] + bezier[3])
+            continue
+
+        # Chord-length parameterization
+        u = [0.0]
+        for a, b in zip(segment, segment[1:]):
+            u.append(u[-1] + math.hypot(b[0] - a[0], b[1] - a[1]))
+        u = [t / u[-1] for t in u]
+
+        bezier = _generate_bezier(segment, u, tan1, tan2)
+        max_dist, split = _max_error(segment, bezier, u)
+        if max_dist > error and max_dist < error * 16:
+            for _ in range(4):
+                u = _reparameterize(segment, bezier, u)
+                bezier = _generate_bezier(segment, u, tan1, tan2)
+                max_dist, split = _max_error(segment, bezier, u)
+                if max_dist <= error:
+                    break
+
+        if max_dist <= error:
+            curves.extend(bezier[1] + bezier[2] + bezier[3])
+            continue
+
+        split += first
+        center = _normalize(pts[split - 1][0] - pts[split + 1][0], pts[split - 1][1] - pts[split + 1][1])
+        if center == (0.0, 0.0):
+            center = _normalize(pts[split - 1][0] - pts[split][0], pts[split - 1][1] - pts[split][1])
+        stack.append((split, last, (-center[0], -center[1]), tan2))
+        stack.append((first, split, tan1, center))
+
+    return curves
+
+
+# How many batches back an item may be merged past; keeps insertion cheap
+# on boards with many distinct styles.
+MAX_BATCH_LOOKBACK = 64
+
+# Shorter last words of a search query match whole tokens, not prefixes
+MIN_PREFIX_LENGTH = 3
+
+# Up to this many search matches are ranked directly; more are found by
+# walking the text grid outward from the viewport
+MAX_RANKED_MATCHES = 5000
+
+# Side of a text index grid cell in world units
+TEXT_CELL_SIZE = 1024
+
+# Placed images are scaled down to fit this many world units on their longer
+# side, keeping up to this many pixels times the screen's scale factor
+MAX_IMAGE_SIZE = 500
+
+# Arrow head length in world units
+ARROW_HEAD_LENGTH = 15
+
+# Maximum distance, in screen pixels, between a stroke's samples and the
+# Bezier curves fitted to them
+CURVE_TOLERANCE = 1.0
+
+# Width of a pressure-sensitive stroke at zero pressure, relative to the brush size
+MIN_PRESSURE_WIDTH = 0.2
+
+# Vertical gap between the pages of an imported PDF, in world units
+VECTOR_PAGE_GAP = 20
+
+# Operations between timeline keyframes
+KEYFRAME_INTERVAL = 256
+
+# Parsed ingest batches waiting for the main thread; readers block beyond this
+MAX_PENDING_BATCHES = 8
+
+# Longest ingest batch line, in bytes; a client sending a longer one is disconnected
+MAX_BATCH_LINE = 64 * 1024 * 1024
+
+# Layer caches are built once the view has held still this many milliseconds
+VIEW_SETTLE_DELAY = 150
+
+# Bands of a parallel redraw are at least this many pixels high
+MIN_BAND_HEIGHT = 64
+
+# Approximate CPython cost of a stroke point tuple and of an item dict,
+# used for memory estimates
+POINT_BYTES = 72
+ITEM_BYTES = 400
+
+# Size of one cairo_path_data_t; a line_to takes two of them, a curve_to four
+PATH_DATA_BYTES = 16
+
+# Default memory budget, overridden by ABOARD_MEMORY_BUDGET (in megabytes)
+MEMORY_BUDGET = 512 * 1024 * 1024
+
+# Stroke keys holding geometry, which is written to disk when a batch is evicted
+STROKE_GEOMETRY = ('points', 'curves', 'pressures', 'outline')
+
+# The live stroke is extrapolated this far (in seconds) past its latest sample,
+# about one frame at 60 Hz
+PREDICTION_HORIZON = 0.016
+
+# Pen velocity is estimated from the samples of this many most recent seconds;
+# a pen that has not moved for that long gets no predicted tail
+VELOCITY_WINDOW = 0.05
+
+# A predicted tail is never longer than this many screen pixels
+MAX_PREDICTION = 24
+
+# Latency and prediction error samples kept for the inking report
+LATENCY_SAMPLES = 2000
+
+# Samples per cached piece of the outline of a live pressure-sensitive stroke
+LIVE_OUTLINE_CHUNK = 16
+
+
+def rects_intersect(a, b):
+    """Check whether two (x0, y0, x1, y1) rectangles overlap."""
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+
+def union_rect(a, b):
+    """Return the smallest rectangle containing both rectangles."""
+    return min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])
+
+
+def stroke_bounds(stroke):
+    """World-space bounding box of a stroke, including its line width."""
+    if 'outline' in stroke:
+        outline = stroke['outline']
+        xs, ys = outline[0::2], outline[1::2]
+        return min(xs), min(ys), max(xs), max(ys)
+    if 'curves' in stroke:
+        # Bezier curves lie within the hull of their control points
+        xs = stroke['curves'][0::2]
+        ys = stroke['curves'][1::2]
+    else:
+        xs = [p[0] for p in stroke['points']]
+        ys = [p[1] for p in stroke['points']]
+    half = stroke['size'] / 2
+    return min(xs) - half, min(ys) - half, max(xs) + half, max(ys) + half
+
+
+def shape_bounds(shape):
+    """World-space bounding box of a shape, including its line width and arrow head."""
+    x0, x1 = sorted((shape['x'], shape['x'] + shape['w']))
+    y0, y1 = sorted((shape['y'], shape['y'] + shape['h']))
+    pad = shape['size'] / 2
+    if shape['type'] == 'arrow':
+        pad += ARROW_HEAD_LENGTH
+    return x0 - pad, y0 - pad, x1 + pad, y1 + pad
+
+
+def stroke_outline(points, pressures, size, cap_segments=6):
+    """
+    Tessellate a pressure-sensitive stroke into a closed world-space polygon:
+    left edge forward, round end cap, right edge back, round start cap.
+    Returns a flat array of x, y pairs.
+    """
+    pts, half_widths = [], []
+    for point, pressure in zip(points, pressures):
+        half_width = size * (MIN_PRESSURE_WIDTH + (1 - MIN_PRESSURE_WIDTH) * pressure) / 2
+        if pts and point == pts[-1]:
+            half_widths[-1] = max(half_widths[-1], half_width)
+            continue
+        pts.append(point)
+        half_widths.append(half_width)
+
+    outline = array('d')
+    if len(pts) == 1:
+        (x, y), r = pts[0], half_widths[0]
+        for k in range(cap_segments * 2):
+            angle = -2 * math.pi * k / (cap_segments * 2)  # same winding as stroke outlines
+            outline.extend((x + r * math.cos(angle), y + r * math.sin(angle)))
+        return outline
+
+    # Unit normals, from the tangent through each point's neighbours
+    normals = []
+    for i in range(len(pts)):
+        a, b = pts[max(i - 1, 0)], pts[min(i + 1, len(pts) - 1)]
+        tx, ty = _normalize(b[0] - a[0], b[1] - a[1])
+        normals.append((-ty, tx))
+
+    def cap(index, start_angle):
+        # Half circle turning from start_angle through the outward tangent
+        (x, y), r = pts[index], half_widths[index]
+        for k in range(1, cap_segments):
+            angle = start_angle - math.pi * k / cap_segments
+            outline.extend((x + r * math.cos(angle), y + r * math.sin(angle)))
+
+    for (x, y), (nx, ny), r in zip(pts, normals, half_widths):
+        outline.extend((x + nx * r, y + ny * r))
+    cap(-1, math.atan2(normals[-1][1], normals[-1][0]))
+    for (x, y), (nx, ny), r in zip(reversed(pts), reversed(normals), reversed(half_widths)):
+        outline.extend((x - nx * r, y - ny * r))
+    cap(0, math.atan2(normals[0][1], normals[0][0]) + math.pi)
+    return outline
+
+
+def append_stroke_path(cr, stroke):
+    """Add a stroke to the current path in world coordinates."""
+    if 'outline' in stroke:
+        outline = stroke['outline']
+        cr.move_to(outline[0], outline[1])
+        for i in range(2, len(outline), 2):
+            cr.line_to(outline[i], outline[i + 1])
+        cr.close_path()
+        return
+
+    if 'curves' in stroke:
+        curves = stroke['curves']
+        cr.move_to(curves[0], curves[1])
+        for i in range(2, len(curves), 6):
+            cr.curve_to(*curves[i:i + 6])
+        return
+
+    points = stroke['points']
+    if len(points) >= 4:
+        points = catmull_rom_spline(points, num_segments=5)
+
+    cr.move_to(*points[0])
+    if len(points) == 1:
+        # Degenerate segment: the round cap paints a dot of the brush size
+        cr.line_to(*points[0])
+    for x, y in points[1:]:
+        cr.line_to(x, y)
+
+
+def append_shape_path(cr, shape):
+    """Add a shape outline to the current path in world coordinates."""
+    x, y = shape['x'], shape['y']
+    w, h = shape['w'], shape['h']
+    shape_type = shape['type']
+
+    if shape_type == 'rect':
+        # Handle negative dimensions
+        if w < 0:
+            x, w = x + w, -w
+        if h < 0:
+            y, h = y + h, -h
+
+        if w > 0 and h > 0:
+            # Rounded rectangle
+            radius = min(w, h) * 0.1
+            radius = min(radius, 20)
+            cr.new_sub_path()
+            cr.arc(x + w - radius, y + radius, radius, -math.pi/2, 0)
+            cr.arc(x + w - radius, y + h - radius, radius, 0, math.pi/2)
+            cr.arc(x + radius, y + h - radius, radius, math.pi/2, math.pi)
+            cr.arc(x + radius, y + radius, radius, math.pi, 3*math.pi/2)
+            cr.close_path()
+
+    elif shape_type == 'circle':
+        radius = min(abs(w), abs(h)) / 2
+        cr.new_sub_path()
+        cr.arc(x + w / 2, y + h / 2, radius, 0, 2 * math.pi)
+
+    elif shape_type == 'triangle':
+        # Handle negative dimensions
+        if w < 0:
+            x, w = x + w, -w
+        if h < 0:
+            y, h = y + h, -h
+
+        # Equilateral-ish triangle pointing up
+        cr.move_to(x + w / 2, y)
+        cr.line_to(x + w, y + h)
+        cr.line_to(x, y + h)
+        cr.close_path()
+
+    elif shape_type == 'arrow':
+        x2, y2 = x + w, y + h
+
+        # Arrow body
+        cr.move_to(x, y)
+        cr.line_to(x2, y2)
+
+        # Arrow head, 30 degrees either side of the body
+        arrow_angle = math.pi / 6
+        angle = math.atan2(h, w)
+        for side in (-1, 1):
+            cr.move_to(x2, y2)
+            cr.line_to(
+                x2 - ARROW_HEAD_LENGTH * math.cos(angle + side * arrow_angle),
+                y2 - ARROW_HEAD_LENGTH * math.sin(angle + side * arrow_angle)
+            )
+
+
+def path_bytes(item):
+    """Rough size of the cairo path data an item adds to its batch."""
+    if 'outline' in item:
+        return len(item['outline']) * PATH_DATA_BYTES
+    if 'curves' in item:
+        return len(item['curves']) // 6 * 4 * PATH_DATA_BYTES + 2 * PATH_DATA_BYTES
+    if 'points' in item:
+        # Catmull-Rom smoothing adds about ten segments per sample
+        return len(item['points']) * 10 * 2 * PATH_DATA_BYTES
+    return 32 * PATH_DATA_BYTES
+
+
+class SpillFile:
+    """
+    A scratch file of blobs, each addressed by (offset, length). Freed ranges
+    are reused by later writes and a free tail is truncated away.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.size = 0
+        self.free_ranges = []       # sorted, non-adjacent (offset, length) of released space
+        self.lock = threading.Lock()
+        open(path, "wb").close()
+
+    def write(self, data):
+        length = len(data)
+        with self.lock:
+            for i, (offset, free) in enumerate(self.free_ranges):
+                if free >= length:
+                    if free == length:
+                        del self.free_ranges[i]
+                    else:
+                        self.free_ranges[i] = (offset + length, free - length)
+                    break
+            else:
+                offset = self.size
+                self.size += length
+            with open(self.path, "r+b") as f:
+                f.seek(offset)
+                f.write(data)
+        return offset, length
+
+    def free(self, offset, length):
+        """Release the range of a blob that is no longer needed."""
+        with self.lock:
+            bisect.insort(self.free_ranges, (offset, length))
+            merged = []
+            for start, size in self.free_ranges:
+                if merged and merged[-1][0] + merged[-1][1] == start:
+                    merged[-1] = (merged[-1][0], merged[-1][1] + size)
+                else:
+                    merged.append((start, size))
+            if merged and merged[-1][0] + merged[-1][1] == self.size:
+                self.size = merged.pop()[0]
+                os.truncate(self.path, self.size)
+            self.free_ranges = merged
+
+    def used_bytes(self):
+        return self.size - sum(length for offset, length in self.free_ranges)
+
+    def read(self, offset, length):
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            return f.read(length)
+
+
+class PathBatch:
+    """A group of items sharing one style, stroked as a single compound path."""
+
+    def __init__(self, color, size, bounds):
+        self.color = color          # None for eraser strokes: painted in the background color
+        self.size = size            # None for filled outlines of pressure-sensitive strokes
+        self.bounds = bounds
+        self.items = []
+        self.pending = []           # items not yet appended to the cached path
+        self.path = None
+        self.path_bytes = 0
+        self.last_drawn = 0.0
+        self.spilled = None         # (SpillFile, offset, length) while the geometry is on disk
+
+    def add(self, item, bounds):
+        self.items.append(item)
+        self.pending.append(item)
+        self.bounds = union_rect(self.bounds, bounds)
+
+    def geometry_bytes(self):
+        total = 0
+        for item in self.items:
+            if 'points' in item:
+                total += len(item['points']) * POINT_BYTES
+            for key in ('curves', 'outline'):
+                if key in item:
+                    total += item[key].itemsize * len(item[key])
+        return total
+
+    def spill(self, spill_file):
+        """Move the items' geometry to spill_file and drop the cached path."""
+        geometry = [{key: item.pop(key) for key in STROKE_GEOMETRY if key in item} for item in self.items]
+        data = zlib.compress(pickle.dumps(geometry, pickle.HIGHEST_PROTOCOL))
+        self.spilled = (spill_file,) + spill_file.write(data)
+        self.path = None
+        self.path_bytes = 0
+        self.pending = []
+
+    def load(self):
+        """The geometry of the spilled items, in item order."""
+        return self.read_geometry(self.spilled)
+
+    @staticmethod
+    def read_geometry(spilled):
+        spill_file, offset, length = spilled
+        return pickle.loads(zlib.decompress(spill_file.read(offset, length)))
+
+    def restore(self):
+        """Read the geometry back; the path is rebuilt on the next draw."""
+        # Items added while spilled kept their geometry and come after the others
+        for item, geometry in zip(self.items, self.load()):
+            item.update(geometry)
+        spill_file, offset, length = self.spilled
+        spill_file.free(offset, length)
+        self.spilled = None
+        self.pending = list(self.items)
+
+
+class BatchCache:
+    """
+    Groups committed items by (color, size) into cached compound paths.
+
+    An item joins the latest batch with the same style unless a batch painted
+    after it overlaps the item, so the batches paint exactly like drawing the
+    items one by one. Eraser strokes are keyed by their flag instead of their
+    color, which keeps the cache valid across theme changes. Strokes with a
+    tessellated outline go into filled batches regardless of their size.
+    """
+
+    def __init__(self, append_path, bounds_func):
+        self.append_path = append_path
+        self.bounds_func = bounds_func
+        self.reset()
+
+    def reset(self):
+        self.source = None
+        self.count = 0
+        self.batches = []
+
+    def sync(self, items):
+        """Batch items appended since the last call; start over if the list was replaced."""
+        if items is not self.source or len(items) < self.count:
+            self.reset()
+            self.source = items
+        for item in items[self.count:]:
+            self.add(item)
+        self.count = len(items)
+
+    def add(self, item):
+        color = None if item.get('is_eraser', False) else tuple(item['color'])
+        size = None if 'outline' in item else item['size']
+        bounds = self.bounds_func(item)
+
+        for batch in reversed(self.batches[-MAX_BATCH_LOOKBACK:]):
+            if batch.color == color and batch.size == size:
+                batch.add(item, bounds)
+                return
+            if rects_intersect(batch.bounds, bounds):
+                break
+
+        batch = PathBatch(color, size, bounds)
+        batch.add(item, bounds)
+        self.batches.append(batch)
+
+    def build_path(self, cr, batch):
+        """Append the batch's pending items to its cached path."""
+        # Build in unscaled world space so arcs are split into curves
+        # at world-unit tolerance, whatever scale is drawing right now
+        cr.save()
+        cr.identity_matrix()
+        cr.new_path()
+        if batch.path is not None:
+            cr.append_path(batch.path)
+        for item in batch.pending:
+            self.append_path(cr, item)
+            batch.path_bytes += path_bytes(item)
+        batch.path = cr.copy_path()
+        cr.restore()
+        batch.pending = []
+
+    def prepare(self, visible=None):
+        """
+        Read back and build the paths of the batches overlapping visible, or
+        of every batch, so that drawing them only reads the cache.
+        """
+        cr = None
+        now = time.monotonic()
+        for batch in self.batches:
+            if visible is not None and not rects_intersect(batch.bounds, visible):
+                continue
+            batch.last_drawn = now
+            if batch.spilled is not None:
+                batch.restore()
+            if batch.pending:
+                if cr is None:
+                    cr = cairo.Context(cairo.ImageSurface(cairo.FORMAT_A8, 1, 1))
+                self.build_path(cr, batch)
+
+    def draw(self, cr, visible, bg_color):
+        """Stroke every batch overlapping the visible world rectangle."""
+        for batch in self.batches:
+            if not rects_intersect(batch.bounds, visible):
+                continue
+
+            if batch.spilled is not None:
+                batch.restore()
+            if batch.pending:
+                self.build_path(cr, batch)
+
+            cr.new_path()
+            cr.append_path(batch.path)
+            cr.set_source_rgb(*(bg_color if batch.color is None else batch.color))
+            if batch.size is None:
+                # Outlines all wind the same way, so one nonzero fill paints their union
+                cr.fill()
+            else:
+                cr.set_line_width(batch.size)
+                cr.stroke()
+
+
+class ImageStore:
+    """
+    Content-addressed pixbuf storage shared by all image items.
+
+    Entries are keyed by a digest of their decoded pixels, so placing the same
+    picture many times keeps a single pixbuf. Items hold a reference through
+    the key and release it when they are removed. An evicted entry keeps only
+    the path of its PNG copy and is loaded again by get(). Drawing uses cairo
+    surfaces of the image at power-of-two reductions, made once per level;
+    the full size is converted from the pixbuf on use rather than kept twice.
+    """
+
+    def __init__(self):
+        self.entries = {}           # digest -> {'pixbuf', 'refs', 'path', 'last_used', 'surfaces'}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def digest(pixbuf):
+        """Hash the visible pixels of a pixbuf, ignoring rowstride padding."""
+        width = pixbuf.get_width()
+        height = pixbuf.get_height()
+        n_channels = pixbuf.get_n_channels()
+        rowstride = pixbuf.get_rowstride()
+        pixels = pixbuf.get_pixels()
+
+        h = hashlib.sha1(f"{width}x{height}x{n_channels}:{pixbuf.get_has_alpha()}".encode())
+        row_bytes = width * n_channels
+        for y in range(height):
+            start = y * rowstride
+            h.update(pixels[start:start + row_bytes])
+        return h.hexdigest()
+
+    def acquire(self, pixbuf, key=None, path=None, history=False):
+        """
+        Add a reference to the pixbuf's pixels and return its key.
+        A known key skips hashing; pixbuf may then be None if the entry exists,
+        or if path names a PNG copy to load it from on first use. History
+        references are those of timelines, which never draw the image.
+        """
+        if key is None:
+            key = self.digest(pixbuf)
+        entry = self.entries.get(key)
+        if entry is None:
+            entry = self.entries[key] = {'pixbuf': pixbuf, 'refs': 0, 'history': 0, 'path': path,
+                                         'last_used': time.monotonic(), 'surfaces': {}}
+        elif entry['pixbuf'] is None and pixbuf is not None:
+            entry['pixbuf'] = pixbuf
+        entry['refs'] += 1
+        if history:
+            entry['history'] += 1
+        return key
+
+    def release(self, key, history=False):
+        """Drop a reference; the pixbuf is freed with the last one."""
+        entry = self.entries.get(key)
+        if entry is None:
+            return
+        entry['refs'] -= 1
+        if history:
+            entry['history'] -= 1
+        if entry['refs'] <= 0:
+            del self.entries[key]
+
+    def history_only(self, key):
+        """Whether only timelines still refer to an entry."""
+        entry = self.entries[key]
+        return entry['refs'] == entry['history']
+
+    def get(self, key):
+        entry = self.entries[key]
+        entry['last_used'] = time.monotonic()
+        if entry['pixbuf'] is None:
+            # Band workers may ask for the same evicted image at once
+            with self.lock:
+                if entry['pixbuf'] is None:
+                    entry['pixbuf'] = GdkPixbuf.Pixbuf.new_from_file(entry['path'])
+        return entry['pixbuf']
+
+    def surface(self, key, level=0):
+        """The image as a cairo surface, halved in size level times."""
+        if not level:
+            return Gdk.cairo_surface_create_from_pixbuf(self.get(key), 1, None)
+        entry = self.entries[key]
+        surface = entry['surfaces'].get(level)
+        if surface is None:
+            pixbuf = self.get(key)
+            pixbuf = pixbuf.scale_simple(max(1, pixbuf.get_width() >> level),
+                                         max(1, pixbuf.get_height() >> level),
+                                         GdkPixbuf.InterpType.BILINEAR)
+            surface = entry['surfaces'][level] = Gdk.cairo_surface_create_from_pixbuf(pixbuf, 1, None)
+        return surface
+
+    def surface_bytes(self, key):
+        return sum(surface.get_stride() * surface.get_height() for surface in self.entries[key]['surfaces'].values())
+
+    def pixel_bytes(self, key):
+        """Resident size of an entry's pixels; 0 while it is evicted."""
+        pixbuf = self.entries[key]['pixbuf']
+        if pixbuf is None:
+            return 0
+        return pixbuf.get_rowstride() * pixbuf.get_height()
+
+    def write(self, key, directory):
+        """
+        Save an entry as <key>.png in directory and return the path.
+        Images already written there are not written again.
+        """
+        path = os.path.join(directory, key + ".png")
+        if not os.path.exists(path):
+            # Spill threads write while the main thread may evict the entry
+            entry = self.entries[key]
+            pixbuf = entry['pixbuf']
+            if pixbuf is None:
+                shutil.copyfile(entry['path'], path)
+            else:
+                pixbuf.savev(path, "png", [], [])
+        return path
+
+    def evict(self, key, directory):
+        """Drop an entry's pixels, keeping a PNG copy in directory to reload from."""
+        entry = self.entries[key]
+        if entry['pixbuf'] is not None:
+            entry['path'] = self.write(key, directory)
+            entry['pixbuf'] = None
+            entry['surfaces'] = {}
+
+
+class VectorSource:
+    """
+    An SVG or PDF file kept in vector form. PDF pages are loaded one at a time
+    when first drawn, not when the document is opened.
+    """
+
+    def __init__(self, store, path):
+        self.store = store
+        self.path = path
+        self.svg = None
+        self.document = None
+        self.pages = {}             # PDF page index -> Poppler.Page
+        self.lock = threading.Lock()  # Poppler and librsvg objects are not thread-safe
+
+        ext = os.path.splitext(path)[1].lower()
+        if ext == ".svg":
+            if Rsvg is None:
+                raise RuntimeError("SVG import needs librsvg (gir1.2-rsvg-2.0)")
+            self.svg = Rsvg.Handle.new_from_file(path)
+            self.n_pages = 1
+        elif ext == ".pdf":
+            if Poppler is None:
+                raise RuntimeError("PDF import needs poppler-glib (gir1.2-poppler-0.18)")
+            self.document = Poppler.Document.new_from_file(GLib.filename_to_uri(path, None), None)
+            self.n_pages = self.document.get_n_pages()
+        else:
+            raise RuntimeError(f"Not a vector file: {path}")
+
+    def page(self, index):
+        page = self.pages.get(index)
+        if page is None:
+            page = self.pages[index] = self.document.get_page(index)
+        return page
+
+    def page_size(self, index):
+        """Natural size of a page; reading it does not render anything."""
+        with self.lock:
+            if self.svg is not None:
+                dims = self.svg.get_dimensions()
+                return dims.width, dims.height
+            return self.page(index).get_size()
+
+    def render(self, cr, index):
+        """Draw a page at its natural size into cr."""
+        with self.lock:
+            if self.svg is not None:
+                self.svg.render_cairo(cr)
+            else:
+                # PDF pages have no background of their own
+                width, height = self.page(index).get_size()
+                cr.set_source_rgb(1, 1, 1)
+                cr.rectangle(0, 0, width, height)
+                cr.fill()
+                self.page(index).render(cr)
+
+
+class VectorStore:
+    """
+    Open vector sources, shared by path, and an LRU cache of their rendered
+    tiles. Tiles are rasterized per power-of-two zoom bucket and only for the
+    visible part of an item. A tile only rasterizes its own part of the page,
+    and band workers render tiles of different documents at the same time.
+    """
+
+    TILE_SIZE = 256
+
+    def __init__(self, max_tiles=256):
+        self.sources = {}           # path -> VectorSource
+        self.tiles = OrderedDict()  # (path, page, bucket, tx, ty) -> cairo.ImageSurface
+        self.max_tiles = max_tiles
+        self.lock = threading.Lock()  # band workers share the tile cache
+
+    def open(self, path):
+        source = self.sources.get(path)
+        if source is None:
+            source = self.sources[path] = VectorSource(self, path)
+        return source
+
+    def tile(self, item, bucket, tx, ty):
+        key = (item['path'], item['page'], bucket, tx, ty)
+        with self.lock:
+            surface = self.tiles.get(key)
+            if surface is not None:
+                self.tiles.move_to_end(key)
+                return surface
+
+        # Rendered outside the cache lock; the source serializes its own calls
+        source = item['source']
+        page_width, page_height = source.page_size(item['page'])
+        surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, self.TILE_SIZE, self.TILE_SIZE)
+        cr = cairo.Context(surface)
+        cr.rectangle(0, 0, self.TILE_SIZE, self.TILE_SIZE)
+        cr.clip()
+        cr.translate(-tx * self.TILE_SIZE, -ty * self.TILE_SIZE)
+        cr.scale(bucket * item['width'] / page_width, bucket * item['height'] / page_height)
+        source.render(cr, item['page'])
+
+        with self.lock:
+            self.tiles[key] = surface
+            self.tiles.move_to_end(key)
+            if len(self.tiles) > self.max_tiles:
+                self.tiles.popitem(last=False)
+        return surface
+
+
+def draw_vector_item(cr, item, visible):
+    """
+    Draw the visible part of a vector item from tiles rasterized at the
+    power-of-two zoom bucket at or above the context's scale in device pixels.
+    """
+    matrix = cr.get_matrix()
+    scale = math.hypot(matrix.xx, matrix.yx) * cr.get_target().get_device_scale()[0]
+    bucket = 2.0 ** max(-4, min(4, math.ceil(math.log2(scale))))
+
+    x0 = max(visible[0], item['x'])
+    y0 = max(visible[1], item['y'])
+    x1 = min(visible[2], item['x'] + item['width'])
+    y1 = min(visible[3], item['y'] + item['height'])
+    if x0 >= x1 or y0 >= y1:
+        return
+
+    store = item['source'].store
+    tile_size = store.TILE_SIZE
+    full_width = item['width'] * bucket
+    full_height = item['height'] * bucket
+    for ty in range(int((y0 - item['y']) * bucket // tile_size), int((y1 - item['y']) * bucket // tile_size) + 1):
+        for tx in range(int((x0 - item['x']) * bucket // tile_size), int((x1 - item['x']) * bucket // tile_size) + 1):
+            cr.save()
+            cr.translate(item['x'] + tx * tile_size / bucket, item['y'] + ty * tile_size / bucket)
+            cr.scale(1 / bucket, 1 / bucket)
+            cr.set_source_surface(store.tile(item, bucket, tx, ty), 0, 0)
+            cr.get_source().set_extend(cairo.EXTEND_PAD)
+            cr.rectangle(0, 0, min(tile_size, full_width - tx * tile_size), min(tile_size, full_height - ty * tile_size))
+            cr.fill()
+            cr.restore()
+
+
+def fit_image(pixbuf, scale=1):
+    """
+    Scale a pixbuf down before it is hashed and stored, and return it with
+    the (width, height) of its item in world units. The item fits
+    MAX_IMAGE_SIZE; the pixels keep up to scale times that, or the source size.
+    """
+    width = pixbuf.get_width()
+    height = pixbuf.get_height()
+    fit = min(1.0, MAX_IMAGE_SIZE / width, MAX_IMAGE_SIZE / height)
+    pixel_fit = min(1.0, fit * scale)
+    if pixel_fit < 1:
+        pixbuf = pixbuf.scale_simple(max(int(width * pixel_fit), 1), max(int(height * pixel_fit), 1),
+                                     GdkPixbuf.InterpType.BILINEAR)
+    return pixbuf, (width * fit, height * fit)
+
+
+def image_bounds(img):
+    """World-space rectangle covered by an image item."""
+    return img['x'], img['y'], img['x'] + img['width'], img['y'] + img['height']
+
+
+def text_bounds(text_item):
+    """Approximate world-space box of a text item, from its baseline origin."""
+    size = text_item['font_size']
+    x, y = text_item['x'], text_item['y']
+    return x, y - size, x + size * 0.6 * len(text_item['text']), y + size * 0.3
+
+
+def draw_text_item(cr, text_item):
+    """Draw a text item on a canvas whose user space is world coordinates."""
+    cr.set_source_rgb(*text_item['color'])
+    cr.select_font_face("Sans", 0, 0)  # CAIRO_FONT_SLANT_NORMAL, CAIRO_FONT_WEIGHT_NORMAL
+    cr.set_font_size(text_item['font_size'])
+
+    cr.move_to(text_item['x'], text_item['y'])
+    cr.show_text(text_item['text'])
+
+
+def draw_image_item(cr, img, image_store):
+    """
+    Draw an image item on a canvas whose user space is world coordinates,
+    from the smallest cached level of the image that still has at least one
+    pixel per device pixel.
+    """
+    pixbuf = image_store.get(img['key'])
+    matrix = cr.get_matrix()
+    scale = math.hypot(matrix.xx, matrix.yx) * cr.get_target().get_device_scale()[0]
+    ratio = img['width'] * scale / pixbuf.get_width()     # device pixels per image pixel
+    level = 0
+    if 0 < ratio < 0.5:
+        level = min(int(-math.log2(ratio)), max(pixbuf.get_width(), pixbuf.get_height()).bit_length() - 1)
+
+    surface = image_store.surface(img['key'], level)
+    cr.save()
+    cr.translate(img['x'], img['y'])
+    cr.scale(img['width'] / surface.get_width(), img['height'] / surface.get_height())
+    cr.set_source_surface(surface, 0, 0)
+    cr.rectangle(0, 0, surface.get_width(), surface.get_height())
+    cr.fill()
+    cr.restore()
+
+
+def tokenize(text):
+    """Lower-case word tokens used by the text index."""
+    return re.findall(r"\w+", text.lower())
+
+
+class TextIndex:
+    """
+    Inverted index over text items, updated as items are added and removed.
+
+    Each token maps to the ids of the items containing it. A sorted copy of the
+    vocabulary answers prefix lookups with a bisect instead of a scan, so the
+    last word of a query matches as the user types. Prefixes shorter than
+    MIN_PREFIX_LENGTH match whole tokens only. Items are also bucketed in a
+    grid of TEXT_CELL_SIZE cells, so that a query matching many items ranks
+    only those in the cells nearest the viewport.
+    """
+
+    def __init__(self):
+        self.items = {}             # id(item) -> item
+        self.postings = {}          # token -> set of item ids
+        self.vocabulary = []        # sorted tokens
+        self.cells = {}             # (cx, cy) -> set of item ids
+
+    @staticmethod
+    def cell(item):
+        return int(item['x'] // TEXT_CELL_SIZE), int(item['y'] // TEXT_CELL_SIZE)
+
+    def add(self, item):
+        item_id = id(item)
+        self.items[item_id] = item
+        self.cells.setdefault(self.cell(item), set()).add(item_id)
+        for token in set(tokenize(item['text'])):
+            ids = self.postings.get(token)
+            if ids is None:
+                ids = self.postings[token] = set()
+                bisect.insort(self.vocabulary, token)
+            ids.add(item_id)
+
+    def add_many(self, items):
+        """Index several items with a single update of the sorted vocabulary."""
+        new_tokens = []
+        cells = self.cells
+        for item in items:
+            item_id = id(item)
+            self.items[item_id] = item
+            cells.setdefault(self.cell(item), set()).add(item_id)
+            for token in set(tokenize(item['text'])):
+                ids = self.postings.get(token)
+                if ids is None:
+                    ids = self.postings[token] = set()
+                    new_tokens.append(token)
+                ids.add(item_id)
+        if new_tokens:
+            self.vocabulary = sorted(self.vocabulary + new_tokens)
+
+    def remove(self, item):
+        item_id = id(item)
+        if self.items.pop(item_id, None) is None:
+            return
+        cell = self.cells[self.cell(item)]
+        cell.discard(item_id)
+        if not cell:
+            del self.cells[self.cell(item)]
+        for token in set(tokenize(item['text'])):
+            ids = self.postings[token]
+            ids.discard(item_id)
+            if not ids:
+                del self.postings[token]
+                del self.vocabulary[bisect.bisect_left(self.vocabulary, token)]
+
+    def clear(self):
+        self.items = {}
+        self.postings = {}
+        self.vocabulary = []
+        self.cells = {}
+
+    def prefix_matches(self, prefix):
+        """Ids of items having a token that starts with prefix."""
+        start = bisect.bisect_left(self.vocabulary, prefix)
+        end = bisect.bisect_left(self.vocabulary, prefix + "\U0010ffff")
+        if end - start == 1:
+            return self.postings[self.vocabulary[start]]
+        ids = set()
+        for token in self.vocabulary[start:end]:
+            ids |= self.postings[token]
+        return ids
+
+    def search(self, query, visible, limit=50):
+        """
+        Return up to limit items matching every query word, nearest to the
+        visible world rectangle first. All words but the last must match whole
+        tokens; the last one matches as a prefix once it is MIN_PREFIX_LENGTH
+        long.
+        """
+        words = tokenize(query)
+        if not words:
+            return []
+
+        candidates = [self.postings.get(word, set()) for word in words[:-1]]
+        last = words[-1]
+        if len(last) < MIN_PREFIX_LENGTH:
+            candidates.append(self.postings.get(last, set()))
+        else:
+            candidates.append(self.prefix_matches(last))
+        candidates.sort(key=len)
+        ids = candidates[0]
+        for other in candidates[1:]:
+            ids = ids & other
+            if not ids:
+                return []
+
+        x0, y0, x1, y1 = visible
+        cx, cy = (x0 + x1) / 2, (y0 + y1) / 2
+
+        def distance(item_id):
+            item = self.items[item_id]
+            # Distance to the viewport edge, then to its center
+            dx = max(x0 - item['x'], 0, item['x'] - x1)
+            dy = max(y0 - item['y'], 0, item['y'] - y1)
+            return math.hypot(dx, dy), math.hypot(item['x'] - cx, item['y'] - cy)
+
+        if len(ids) <= MAX_RANKED_MATCHES:
+            return [self.items[i] for i in heapq.nsmallest(limit, ids, key=distance)]
+
+        # Visit grid cells in order of the smallest distance any item in them
+        # can have, until no unvisited cell can beat the limit-th best match
+        def cell_bound(cell):
+            left, top = cell[0] * TEXT_CELL_SIZE, cell[1] * TEXT_CELL_SIZE
+            right, bottom = left + TEXT_CELL_SIZE, top + TEXT_CELL_SIZE
+            dx = max(x0 - right, 0, left - x1)
+            dy = max(y0 - bottom, 0, top - y1)
+            cdx = max(left - cx, 0, cx - right)
+            cdy = max(top - cy, 0, cy - bottom)
+            return math.hypot(dx, dy), math.hypot(cdx, cdy)
+
+        cells = [(cell_bound(cell), cell) for cell in self.cells]
+        heapq.heapify(cells)
+        best = []                   # heap of (negated distance, item id), the limit nearest so far
+        while cells:
+            bound, cell = heapq.heappop(cells)
+            if len(best) == limit and bound > tuple(-d for d in best[0][0]):
+                break
+            for item_id in self.cells[cell]:
+                if item_id in ids:
+                    key = tuple(-d for d in distance(item_id))
+                    if len(best) < limit:
+                        heapq.heappush(best, (key, item_id))
+                    elif key > best[0][0]:
+                        heapq.heapreplace(best, (key, item_id))
+        best.sort(reverse=True)
+        return [self.items[item_id] for key, item_id in best]
+
+
+class Layer:
+    """
+    A named set of items drawn together, with a cached rendering of its own.
+
+    Every change bumps version, which keys the layer's cached surface, so
+    untouched layers are composited instead of redrawn.
+    """
+
+    def __init__(self, name, text_index):
+        self.name = name
+        self.visible = True
+        self.locked = False
+        self.version = 0
+        self.text_index = text_index    # shared by all layers of a board
+
+        self.strokes = []           # list of strokes, each stroke is a dict with 'points', 'color', 'size', 'is_eraser'
+        self.shapes = []            # list of shapes: {'type': 'rect'/'circle'/'triangle'/'arrow', 'x', 'y', 'w', 'h', 'color', 'size'}
+        self.text_items = []        # list of text items: {'text', 'x', 'y', 'color', 'font_size'}
+        self.images = []            # list of images: {'key', 'x', 'y', 'width', 'height'}, pixels live in app.image_store
+        self.vectors = []           # list of SVG/PDF pages: {'path', 'page', 'source', 'x', 'y', 'width', 'height'}
+
+        # committed strokes and shapes, grouped by style into cached paths
+        self.stroke_batches = BatchCache(append_stroke_path, stroke_bounds)
+        self.shape_batches = BatchCache(append_shape_path, shape_bounds)
+
+        # rendering of this layer alone, for the view in surface_key
+        self.surface = None
+        self.surface_key = None
+
+    @property
+    def editable(self):
+        return self.visible and not self.locked
+
+    def add_stroke(self, stroke):
+        self.strokes.append(stroke)
+        self.version += 1
+
+    def add_shape(self, shape):
+        self.shapes.append(shape)
+        self.version += 1
+
+    def add_image(self, img):
+        self.images.append(img)
+        self.version += 1
+
+    def add_vector(self, item):
+        self.vectors.append(item)
+        self.version += 1
+
+    def add_text_item(self, text_item):
+        self.text_items.append(text_item)
+        self.text_index.add(text_item)
+        self.version += 1
+
+    def add_items(self, kind, items):
+        """Append several items to the list of the given kind with one version bump."""
+        getattr(self, kind).extend(items)
+        if kind == 'text_items':
+            self.text_index.add_many(items)
+        self.version += 1
+
+    def remove_text_item(self, text_item):
+        """Remove a text item, matched by identity; return whether it was here."""
+        for i, item in enumerate(self.text_items):
+            if item is text_item:
+                del self.text_items[i]
+                self.text_index.remove(text_item)
+                self.version += 1
+                return True
+        return False
+
+    def clear(self, image_store):
+        """
+        Remove every item and return the stroke batches, which the timeline
+        keeps; evicted geometry stays on disk.
+        """
+        self.stroke_batches.sync(self.strokes)
+        batches = self.stroke_batches.batches
+        for batch in batches:
+            batch.path = None
+            batch.path_bytes = 0
+            batch.pending = []
+        self.stroke_batches.reset()
+        self.shape_batches.reset()
+        for img in self.images:
+            image_store.release(img['key'])
+        for text_item in self.text_items:
+            self.text_index.remove(text_item)
+        self.strokes = []
+        self.shapes = []
+        self.text_items = []
+        self.images = []
+        self.vectors = []
+        self.version += 1
+        return batches
+
+    def extend(self, other):
+        """Append all items of another layer, taking over its image references."""
+        self.strokes.extend(other.strokes)
+        self.shapes.extend(other.shapes)
+        for text_item in other.text_items:
+            self.add_text_item(text_item)
+        self.images.extend(other.images)
+        self.vectors.extend(other.vectors)
+        self.version += 1
+
+    def sync_caches(self):
+        self.stroke_batches.sync(self.strokes)
+        self.shape_batches.sync(self.shapes)
+
+    def prepare(self, visible=None):
+        """Bring the batch paths in visible up to date ahead of drawing from worker threads."""
+        self.sync_caches()
+        self.stroke_batches.prepare(visible)
+        self.shape_batches.prepare(visible)
+
+    def path_bytes(self):
+        """Size of the cached batch paths."""
+        return sum(batch.path_bytes for batch in self.stroke_batches.batches + self.shape_batches.batches)
+
+    def bounds(self):
+        """World-space bounding box of all items, or None for an empty layer."""
+        self.sync_caches()
+        rects = [batch.bounds for batch in self.stroke_batches.batches]
+        rects += [batch.bounds for batch in self.shape_batches.batches]
+        rects += [text_bounds(t) for t in self.text_items]
+        rects += [image_bounds(img) for img in self.images]
+        rects += [image_bounds(item) for item in self.vectors]
+        if not rects:
+            return None
+        result = rects[0]
+        for rect in rects[1:]:
+            result = union_rect(result, rect)
+        return result
+
+    def item_bytes(self):
+        """Rough resident size of the items in bytes, excluding image pixels."""
+        n_points = sum(len(s['points']) for s in self.strokes if 'points' in s)
+        curve_bytes = sum(s['curves'].itemsize * len(s['curves']) for s in self.strokes if 'curves' in s)
+        curve_bytes += sum(s['outline'].itemsize * len(s['outline']) for s in self.strokes if 'outline' in s)
+        n_items = len(self.strokes) + len(self.shapes) + len(self.text_items) + len(self.images) + len(self.vectors)
+        return n_points * POINT_BYTES + curve_bytes + n_items * ITEM_BYTES
+
+    def draw(self, cr, visible, image_store, bg_color):
+        """
+        Draw every item overlapping the visible world rectangle, in layer order:
+        vector backgrounds, images, strokes, shapes, then text. The context
+        must be in world space.
+        """
+        for item in self.vectors:
+            if item['source'] is not None and rects_intersect(image_bounds(item), visible):
+                draw_vector_item(cr, item, visible)
+
+        for img in self.images:
+            if rects_intersect(image_bounds(img), visible):
+                draw_image_item(cr, img, image_store)
+
+        self.sync_caches()
+        self.stroke_batches.draw(cr, visible, bg_color)
+        self.shape_batches.draw(cr, visible, bg_color)
+
+        for text_item in self.text_items:
+            if rects_intersect(text_bounds(text_item), visible):
+                draw_text_item(cr, text_item)
+
+
+class Timeline:
+    """
+    Timestamped record of the operations committed to a board, for playback.
+
+    Operations are ('add', layer, kind, item), ('remove', layer, kind, item)
+    and ('clear', layer, None, None), where kind names the layer list holding
+    the item and a clear without a layer clears them all. Every
+    KEYFRAME_INTERVAL operations a keyframe notes the length of each layer
+    list, so the board at any moment is rebuilt from the nearest keyframe
+    and at most KEYFRAME_INTERVAL operations. The lists only grow and are
+    shared by all keyframes: a clear or removal starts new ones instead.
+    """
+
+    def __init__(self):
+        self.start = time.time()
+        self.times = []
+        self.ops = []
+        self.layers = {}            # every layer operated on, in first-seen order -> None
+        self.lists = {}             # layer -> {kind: items since the layer was last cleared}
+        self.keyframes = [{}]       # per KEYFRAME_INTERVAL ops: layer -> {kind: (items, length)}
+        self.archive = []           # PathBatches of cleared strokes, evictable like live ones
+        self.retired = 0            # cleared or removed items other than strokes
+
+    @staticmethod
+    def apply(lists, op, layer, kind, item):
+        """Apply one operation to a layer -> {kind: items} mapping."""
+        if op == 'add':
+            lists.setdefault(layer, {}).setdefault(kind, []).append(item)
+        elif op == 'remove':
+            kinds = lists.get(layer, {})
+            if kind in kinds:
+                kinds[kind] = [other for other in kinds[kind] if other is not item]
+        elif layer is None:
+            lists.clear()
+        else:
+            lists.pop(layer, None)
+
+    def record(self, op, layer, kind=None, item=None, when=None):
+        self.times.append(time.time() if when is None else when)
+        self.ops.append((op, layer, kind, item))
+        if layer is not None:
+            self.layers.setdefault(layer)
+        if op == 'remove':
+            self.retired += 1
+        elif op == 'clear':
+            for kinds in (self.lists.values() if layer is None else [self.lists.get(layer, {})]):
+                self.retired += sum(len(items) for kind, items in kinds.items() if kind != 'strokes')
+        self.apply(self.lists, op, layer, kind, item)
+        if len(self.ops) % KEYFRAME_INTERVAL == 0:
+            self.keyframes.append({layer: {kind: (items, len(items)) for kind, items in kinds.items()}
+                                   for layer, kinds in self.lists.items()})
+
+    def state(self, n):
+        """The layer lists after the first n operations, as layer -> {kind: items}."""
+        base = n - n % KEYFRAME_INTERVAL
+        lists = {layer: {kind: items[:length] for kind, (items, length) in kinds.items()}
+                 for layer, kinds in self.keyframes[base // KEYFRAME_INTERVAL].items()}
+        for op, layer, kind, item in self.ops[base:n]:
+            self.apply(lists, op, layer, kind, item)
+        return lists
+
+    def items(self, kind):
+        """Every item ever added to a list of the given kind."""
+        for op, layer, item_kind, item in self.ops:
+            if op == 'add' and item_kind == kind:
+                yield item
+
+    def keep(self, batches):
+        """Take over the stroke batches of a cleared layer."""
+        self.archive.extend(batches)
+
+    def keep_strokes(self, strokes):
+        """Batch strokes that are only in the timeline, so they can be evicted."""
+        cache = BatchCache(append_stroke_path, stroke_bounds)
+        cache.sync(strokes)
+        self.keep(cache.batches)
+
+    def history_bytes(self):
+        """Rough resident size of the items that are only in the timeline."""
+        strokes = sum(len(batch.items) for batch in self.archive)
+        geometry = sum(batch.geometry_bytes() for batch in self.archive if batch.spilled is None)
+        return (strokes + self.retired) * ITEM_BYTES + geometry
+
+    def extend(self, other, layer_map):
+        """Append the operations of another timeline, renaming its layers through layer_map."""
+        for when, (op, layer, kind, item) in zip(other.times, other.ops):
+            self.record(op, layer_map.get(layer, layer), kind, item, when)
+        self.archive.extend(other.archive)
+
+
+class BoardContent:
+    """
+    The layers of one board page, bottom first, the text index they share
+    and the timeline of everything committed to them.
+    """
+
+    def __init__(self):
+        self.text_index = TextIndex()
+        self.layers = [Layer("Layer 1", self.text_index)]
+        self.active = 0             # index of the layer new items go into
+        self.timeline = Timeline()
+
+    @property
+    def active_layer(self):
+        return self.layers[self.active]
+
+    def commit(self, kind, item):
+        """Add an item to the active layer's list of the given kind and record it."""
+        layer = self.active_layer
+        adders = {'strokes': layer.add_stroke, 'shapes': layer.add_shape, 'text_items': layer.add_text_item,
+                  'images': layer.add_image, 'vectors': layer.add_vector}
+        adders[kind](item)
+        self.timeline.record('add', layer, kind, item)
+
+    def commit_many(self, kind, items):
+        """Add several items of one kind to the active layer at once and record them."""
+        layer = self.active_layer
+        layer.add_items(kind, items)
+        now = time.time()
+        for item in items:
+            self.timeline.record('add', layer, kind, item, now)
+
+    def add_layer(self):
+        """Insert an empty layer above the active one and make it active."""
+        names = {layer.name for layer in self.layers}
+        n = len(self.layers) + 1
+        while f"Layer {n}" in names:
+            n += 1
+        self.active += 1
+        self.layers.insert(self.active, Layer(f"Layer {n}", self.text_index))
+
+    def remove_layer(self, index, image_store):
+        """Delete a layer and its items, unless it is the last one or hidden or locked."""
+        if len(self.layers) > 1 and self.layers[index].editable:
+            self.timeline.keep(self.layers[index].clear(image_store))
+            self.timeline.record('clear', self.layers[index])
+            del self.layers[index]
+            self.active = min(self.active, len(self.layers) - 1)
+
+    def move_layer(self, index, delta):
+        """Move a layer up (delta > 0) or down the stack, keeping it active if it was."""
+        target = index + delta
+        if 0 <= target < len(self.layers):
+            layers = self.layers
+            layers[index], layers[target] = layers[target], layers[index]
+            if self.active == index:
+                self.active = target
+            elif self.active == target:
+                self.active = index
+
+    def clear(self, image_store):
+        for layer in self.layers:
+            self.timeline.keep(layer.clear(image_store))
+        self.timeline.record('clear', None)
+
+    def clear_editable(self, image_store):
+        """Clear the layers that are visible and unlocked, leaving the others alone."""
+        if all(layer.editable for layer in self.layers):
+            self.clear(image_store)
+            return
+        for layer in self.layers:
+            if layer.editable:
+                self.timeline.keep(layer.clear(image_store))
+                self.timeline.record('clear', layer)
+
+    def remove_text_item(self, text_item):
+        """Remove a text item unless its layer is hidden or locked; return whether it was removed."""
+        for layer in self.layers:
+            if layer.editable and layer.remove_text_item(text_item):
+                self.timeline.record('remove', layer, 'text_items', text_item)
+                return True
+        return False
+
+    def extend(self, other):
+        """
+        Append the items and timeline of another board layer by layer,
+        taking over its image references.
+        """
+        for i, layer in enumerate(other.layers):
+            if i == len(self.layers):
+                self.layers.append(Layer(layer.name, self.text_index))
+            self.layers[i].extend(layer)
+        self.timeline.extend(other.timeline, dict(zip(other.layers, self.layers)))
+
+    def iter_images(self):
+        """Image items of the layers and of the timeline, which holds its own references."""
+        for layer in self.layers:
+            yield from layer.images
+        yield from self.timeline.items('images')
+
+    def iter_layer_images(self):
+        for layer in self.layers:
+            yield from layer.images
+
+    def iter_vectors(self):
+        for layer in self.layers:
+            yield from layer.vectors
+        yield from self.timeline.items('vectors')
+
+    def iter_strokes(self):
+        for layer in self.layers:
+            yield from layer.strokes
+
+    def sync_caches(self):
+        for layer in self.layers:
+            layer.sync_caches()
+
+    def bounds(self):
+        """World-space bounding box of all items, or None for an empty board."""
+        rects = [r for r in (layer.bounds() for layer in self.layers) if r is not None]
+        if not rects:
+            return None
+        result = rects[0]
+        for rect in rects[1:]:
+            result = union_rect(result, rect)
+        return result
+
+    def memory_estimate(self, image_store):
+        """Rough resident size in bytes, counting each distinct image once."""
+        pixel_bytes = sum(image_store.pixel_bytes(key) for key in {img['key'] for img in self.iter_images()})
+        return sum(layer.item_bytes() for layer in self.layers) + pixel_bytes
+
+    def draw(self, cr, visible, image_store, bg_color):
+        """Draw the visible layers bottom to top, without their cached surfaces."""
+        for layer in self.layers:
+            if layer.visible:
+                layer.draw(cr, visible, image_store, bg_color)
+
+
+class BandRenderer:
+    """
+    Draws cold frames on a thread pool. The target is split into horizontal
+    bands that workers rasterize into surfaces of their own, and the bands
+    are composited in order on the calling thread.
+
+    pycairo releases the GIL while it strokes and fills, so the bands
+    rasterize in parallel. Workers only read the layers: batch paths are
+    built beforehand and the caller waits for every band, so nothing can
+    change the items while they are drawn.
+    """
+
+    def __init__(self, workers=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.pool = None
+        if self.workers > 1:
+            self.pool = ThreadPoolExecutor(self.workers, thread_name_prefix="band")
+
+    def shutdown(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=False)
+            self.pool = None
+
+    def render(self, cr, layers, view, width, height, image_store, bg_color):
+        """
+        Draw the visible layers, bottom first, into cr whose origin is the top
+        left corner of a width x height viewport showing view, an
+        (offset_x, offset_y, zoom) tuple. Bands match the device scale of
+        the target, so they stay sharp on HiDPI screens.
+        """
+        layers = [layer for layer in layers if layer.visible]
+        offset_x, offset_y, zoom = view
+        visible = (-offset_x / zoom, -offset_y / zoom, (width - offset_x) / zoom, (height - offset_y) / zoom)
+        for layer in layers:
+            layer.prepare(visible)
+
+        n_bands = min(self.workers, height // MIN_BAND_HEIGHT)
+        if self.pool is None or n_bands < 2:
+            cr.save()
+            self.draw_band(cr, layers, view, 0, width, height, image_store, bg_color)
+            cr.restore()
+            return
+
+        band_height = -(-height // n_bands)
+        scale = cr.get_target().get_device_scale()[0]
+        futures = [
+            (y, self.pool.submit(self.render_band, layers, view, y, width, min(band_height, height - y),
+                                 scale, image_store, bg_color))
+            for y in range(0, height, band_height)
+        ]
+        for y, future in futures:
+            cr.set_source_surface(future.result(), 0, y)
+            cr.paint()
+
+    def render_band(self, layers, view, y, width, height, scale, image_store, bg_color):
+        """Rasterize the band starting at viewport row y into a new surface of the given device scale."""
+        surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, math.ceil(width * scale), math.ceil(height * scale))
+        surface.set_device_scale(scale, scale)
+        cr = cairo.Context(surface)
+        cr.set_line_cap(1)  # CAIRO_LINE_CAP_ROUND
+        cr.set_line_join(1)  # CAIRO_LINE_JOIN_ROUND
+        cr.translate(0, -y)
+        self.draw_band(cr, layers, view, y, width, height, image_store, bg_color)
+        surface.flush()
+        return surface
+
+    @staticmethod
+    def draw_band(cr, layers, view, y, width, height, image_store, bg_color):
+        offset_x, offset_y, zoom = view
+        cr.translate(offset_x, offset_y)
+        cr.scale(zoom, zoom)
+        visible = (-offset_x / zoom, (y - offset_y) / zoom,
+                   (width - offset_x) / zoom, (y + height - offset_y) / zoom)
+        for layer in layers:
+            layer.draw(cr, visible, image_store, bg_color)
+
+
+def benchmark(n_strokes=100000, width=1920, height=1080):
+    """
+    Time cold frames of a synthetic board with n_strokes random strokes, with
+    the band renderer on 1, 2, 4... worker threads up to the number of cores.
+    """
+    rng = random.Random(0)
+    palette = [(0, 0, 0), (0.8, 0.1, 0.1), (0.1, 0.3, 0.8), (0.1, 0.6, 0.2)]
+    content = BoardContent()
+    layer = content.active_layer
+    for _ in range(n_strokes):
+        x, y = rng.uniform(0, width), rng.uniform(0, height)
+        points = []
+        for _ in range(rng.randint(4, 16)):
+            x += rng.uniform(-12, 12)
+            y += rng.uniform(-12, 12)
+            points.append((x, y))
+        layer.add_stroke({'points': points, 'color': rng.choice(palette),
+                          'size': rng.choice((2, 3, 5)), 'is_eraser': False})
+
+    start = time.perf_counter()
+    layer.prepare()
+    print(f"{n_strokes} strokes, {len(layer.stroke_batches.batches)} batches, "
+          f"paths built in {time.perf_counter() - start:.2f}s")
+
+    image_store = ImageStore()
+    target = cairo.ImageSurface(cairo.FORMAT_ARGB32, width, height)
+    workers = 1
+    baseline = None
+    while True:
+        renderer = BandRenderer(workers)
+        cr = cairo.Context(target)
+        renderer.render(cr, content.layers, (0, 0, 1.0), width, height, image_store, (1, 1, 1))  # warm up
+        times = []
+        for _ in range(3):
+            cr = cairo.Context(target)
+            cr.set_source_rgb(1, 1, 1)
+            cr.paint()
+            start = time.perf_counter()
+            renderer.render(cr, content.layers, (0, 0, 1.0), width, height, image_store, (1, 1, 1))
+            target.flush()
+            times.append(time.perf_counter() - start)
+        renderer.shutdown()
+        frame = min(times)
+        baseline = baseline or frame
+        print(f"{workers:3d} workers: {frame * 1000:8.1f} ms  ({baseline / frame:.2f}x)")
+
+        if workers >= (os.cpu_count() or 1):
+            break
+        workers = min(workers * 2, os.cpu_count() or 1)
+
+
 class WhiteboardArea(Gtk.DrawingArea):
+    __gsignals__ = {
+        # world rectangle (x0, y0, x1, y1) whose items changed, or None for all
+        'content-changed': (GObject.SignalFlags.RUN_FIRST, None, (object,)),
+        # offset or zoom changed since the last frame
+        'view-changed': (GObject.SignalFlags.RUN_FIRST, None, ()),
+    }
+
     def __init__(self, app):
         super().__init__()
         self.app = app
@@ -60,15 +1730,13 @@ class WhiteboardArea(Gtk.DrawingArea):
             Gdk.EventMask.SCROLL_MASK |
             Gdk.EventMask.KEY_PRESS_MASK
         )
-        self.strokes = []           # list of strokes, each stroke is a dict with 'points', 'color', 'size', 'is_eraser'
-        self.current_stroke = None
+        self.content = BoardContent()   # committed items of the active page
+        self.current_stroke = None     # drawn by the InkOverlay, not here
+        self.ink = None
         self.brush_size = 3
-        self.shapes = []            # list of shapes: {'type': 'rect'/'circle'/'triangle'/'arrow', 'x', 'y', 'w', 'h', 'color', 'size'}
         self.current_shape = None
         self.shape_start_x = 0
         self.shape_start_y = 0
-        self.text_items = []        # list of text items: {'text', 'x', 'y', 'color', 'font_size'}
-        self.images = []            # list of images: {'pixbuf', 'x', 'y', 'width', 'height'}
 
         # panning: shifting the "camera"
         self.offset_x = 0
@@ -81,26 +1749,111 @@ class WhiteboardArea(Gtk.DrawingArea):
         self.zoom = 1.0
         self.min_zoom = 0.1
         self.max_zoom = 5.0
+        self.view_animation = None  # tick callback id while animating the camera
+        self.last_view = None
+
+        # layer surface caching: the view the caches are valid for, and the
+        # composites of the visible layers below and above the active one
+        self.cached_view_key = None
+        self.group_surfaces = {}    # 'below'/'above' -> (key, surface)
+        self.cache_source = None    # timeout that builds the caches after the view settles
 
         self.connect("draw", self.on_draw)
         self.connect("button-press-event", self.on_button_press)
         self.connect("motion-notify-event", self.on_motion)
         self.connect("button-release-event", self.on_button_release)
         self.connect("scroll-event", self.on_scroll)
+        self.connect("notify::scale-factor", self.on_scale_factor_changed)
 
         self.set_hexpand(True)
         self.set_vexpand(True)
         self.set_can_focus(True)
 
     def clear(self):
-        self.strokes = []
+        self.content.clear_editable(self.app.image_store)
         self.current_stroke = None
-        self.shapes = []
         self.current_shape = None
-        self.text_items = []
-        self.images = []
+        self.content_changed()
+
+    def on_scale_factor_changed(self, widget, pspec):
+        """Cached surfaces are in device pixels; drop them when the window changes monitor."""
+        for layer in self.content.layers:
+            layer.surface = None
+            layer.surface_key = None
+        self.group_surfaces = {}
+        self.queue_draw()
+
+    def set_content(self, content, view):
+        """Show another board's items with its (offset_x, offset_y, zoom) view."""
+        # Layer surfaces are only worth keeping for the page on screen
+        for layer in self.content.layers:
+            layer.surface = None
+            layer.surface_key = None
+        self.group_surfaces = {}
+        self.cached_view_key = None     # draw the new page directly until the caches are built
+        self.content = content
+        self.offset_x, self.offset_y, self.zoom = view
+        self.current_stroke = None
+        self.current_shape = None
+        self.content_changed()
+
+    def content_changed(self, rect=None):
+        """Notify listeners that items in the world rect (None: anywhere) changed, and redraw."""
+        self.emit("content-changed", rect)
         self.queue_draw()
 
+    def get_view(self):
+        return self.offset_x, self.offset_y, self.zoom
+
+    def apply_world_transform(self, cr):
+        """Make world coordinates the user space of the cairo context."""
+        cr.translate(self.offset_x, self.offset_y)
+        cr.scale(self.zoom, self.zoom)
+
+    def visible_world_rect(self):
+        """World-space rectangle currently shown in the widget."""
+        x0, y0 = self.screen_to_world(0, 0)
+        x1, y1 = self.screen_to_world(self.get_allocated_width(), self.get_allocated_height())
+        return x0, y0, x1, y1
+
+    def animate_view(self, center_x, center_y, zoom, duration=0.35):
+        """Glide the camera so the world point (center_x, center_y) ends up centered at zoom."""
+        self.stop_view_animation()
+
+        width = self.get_allocated_width()
+        height = self.get_allocated_height()
+        start_x, start_y = self.screen_to_world(width / 2, height / 2)
+        start_zoom = self.zoom
+        start_time = None
+
+        def tick(widget, frame_clock):
+            nonlocal start_time
+            now = frame_clock.get_frame_time() / 1e6
+            if start_time is None:
+                start_time = now
+            t = min((now - start_time) / duration, 1.0)
+            eased = 1 - (1 - t) ** 3  # ease-out cubic
+
+            # Interpolate the world center linearly and the zoom geometrically
+            self.zoom = start_zoom * (zoom / start_zoom) ** eased
+            cx = start_x + (center_x - start_x) * eased
+            cy = start_y + (center_y - start_y) * eased
+            self.offset_x = width / 2 - cx * self.zoom
+            self.offset_y = height / 2 - cy * self.zoom
+            self.queue_draw()
+
+            if t >= 1.0:
+                self.view_animation = None
+                return GLib.SOURCE_REMOVE
+            return GLib.SOURCE_CONTINUE
+
+        self.view_animation = self.add_tick_callback(tick)
+
+    def stop_view_animation(self):
+        if self.view_animation is not None:
+            self.remove_tick_callback(self.view_animation)
+            self.view_animation = None
+
     def screen_to_world(self, sx, sy):
         """Convert screen coordinates to world coordinates (accounting for camera offset and zoom)."""
         return (sx - self.offset_x) / self.zoom, (sy - self.offset_y) / self.zoom
@@ -158,187 +1911,153 @@ class WhiteboardArea(Gtk.DrawingArea):
         cr.set_line_cap(1)  # CAIRO_LINE_CAP_ROUND
         cr.set_line_join(1)  # CAIRO_LINE_JOIN_ROUND
 
-        # Draw images
-        for img in self.images:
-            sx, sy = self.world_to_screen(img['x'], img['y'])
-            scaled_width = img['width'] * self.zoom
-            scaled_height = img['height'] * self.zoom
-
-            # Scale pixbuf
-            scaled_pixbuf = img['pixbuf'].scale_simple(
-                int(scaled_width), int(scaled_height),
-                GdkPixbuf.InterpType.BILINEAR
-            )
-
-            Gdk.cairo_set_source_pixbuf(cr, scaled_pixbuf, sx, sy)
-            cr.paint()
-
-        # draw all the strokes
-        for stroke in self.strokes:
-            points = stroke['points']
-            color = stroke['color']
-            size = stroke['size']
-
-            cr.set_source_rgb(*color)
-            cr.set_line_width(size * self.zoom)
-
-            if len(points) < 2:
-                if points:
-                    sx, sy = self.world_to_screen(points[0][0], points[0][1])
-                    cr.arc(sx, sy, size * self.zoom / 2, 0, 2 * math.pi)
-                    cr.fill()
-                continue
-
-            # Apply smoothing for longer strokes
-            if len(points) >= 4:
-                smoothed_points = catmull_rom_spline(points, num_segments=5)
-            else:
-                smoothed_points = points
-
-            sx, sy = self.world_to_screen(smoothed_points[0][0], smoothed_points[0][1])
-            cr.move_to(sx, sy)
-            for x, y in smoothed_points[1:]:
-                sx, sy = self.world_to_screen(x, y)
-                cr.line_to(sx, sy)
-            cr.stroke()
-
-        # Draw shapes
-        for shape in self.shapes:
-            self.draw_shape(cr, shape)
+        self.draw_layers(cr)
 
         # Draw current shape being created
         if self.current_shape:
+            cr.save()
+            self.apply_world_transform(cr)
             self.draw_shape(cr, self.current_shape)
+            cr.restore()
 
-        # Draw text items
-        for text_item in self.text_items:
-            self.draw_text_item(cr, text_item)
+        view = self.get_view()
+        if view != self.last_view:
+            self.last_view = view
+            self.emit("view-changed")
 
-        # The current stroke
-        if self.current_stroke and len(self.current_stroke['points']) >= 2:
-            cr.set_source_rgb(*self.current_stroke['color'])
-            cr.set_line_width(self.current_stroke['size'] * self.zoom)
-            points = self.current_stroke['points']
+    def draw_layers(self, cr):
+        """
+        Draw the visible layers bottom to top. While the view holds still,
+        the active layer and the layers below and above it are rendered into
+        one cached surface each, so a frame costs three composites however
+        many layers there are.
+        """
+        view_key = self.view_key()
+        if view_key != self.cached_view_key:
+            # The view is moving: draw straight to the window and build the
+            # caches once it holds still, ahead of the next frame
+            self.cached_view_key = view_key
+            self.app.band_renderer.render(cr, self.content.layers, self.get_view(), self.get_allocated_width(),
+                                          self.get_allocated_height(), self.app.image_store, self.app.bg_color)
+            if self.cache_source is not None:
+                GLib.source_remove(self.cache_source)
+            self.cache_source = GLib.timeout_add(VIEW_SETTLE_DELAY, self.build_caches)
+            return
+
+        for surface in self.cache_surfaces(view_key):
+            cr.set_source_surface(surface, 0, 0)
+            cr.paint()
 
-            # Apply smoothing
-            if len(points) >= 4:
-                smoothed_points = catmull_rom_spline(points, num_segments=5)
+    def trim_caches(self):
+        """
+        Drop the surfaces of layers that are only drawn through a group
+        composite or are hidden, and return the bytes freed. A group renders
+        them again only when it has to be rebuilt.
+        """
+        layers = self.content.layers
+        active = self.content.active
+        kept = set()                # layers whose own surface is painted every frame
+        for group in (layers[:active], layers[active:active + 1], layers[active + 1:]):
+            group = [layer for layer in group if layer.visible]
+            if len(group) == 1:
+                kept.add(group[0])
+        freed = 0
+        for layer in layers:
+            if layer.surface is not None and layer not in kept:
+                freed += surface_bytes([layer.surface])
+                layer.surface = None
+                layer.surface_key = None
+        return freed
+
+    def view_key(self):
+        """Everything the cached layer surfaces depend on besides the layers themselves."""
+        return (self.offset_x, self.offset_y, self.zoom, self.get_allocated_width(), self.get_allocated_height(),
+                self.get_scale_factor(), self.app.bg_color)
+
+    def build_caches(self):
+        """
+        Render the layer caches for a view that held still since the last
+        frame, so pen-down or a small redraw does not pay for every layer.
+        """
+        self.cache_source = None
+        if self.cached_view_key is not None and self.cached_view_key == self.view_key():
+            self.cache_surfaces(self.cached_view_key)
+        return False
+
+    def cache_surfaces(self, view_key):
+        """Surfaces of the visible layers below, at and above the active one, built as needed."""
+        surfaces = []
+        layers = self.content.layers
+        active = self.content.active
+        for name, group in (('below', layers[:active]), ('active', layers[active:active + 1]),
+                            ('above', layers[active + 1:])):
+            group = [layer for layer in group if layer.visible]
+            if not group:
+                continue
+            if len(group) == 1:
+                surfaces.append(self.layer_surface(group[0], view_key))
             else:
-                smoothed_points = points
+                surfaces.append(self.group_surface(name, group, view_key))
+        return surfaces
 
-            sx, sy = self.world_to_screen(smoothed_points[0][0], smoothed_points[0][1])
-            cr.move_to(sx, sy)
-            for x, y in smoothed_points[1:]:
-                sx, sy = self.world_to_screen(x, y)
-                cr.line_to(sx, sy)
-            cr.stroke()
-        elif self.current_stroke and len(self.current_stroke['points']) == 1:
-            cr.set_source_rgb(*self.current_stroke['color'])
-            cr.set_line_width(self.current_stroke['size'] * self.zoom)
-            x, y = self.current_stroke['points'][0]
-            sx, sy = self.world_to_screen(x, y)
-            cr.arc(sx, sy, self.current_stroke['size'] * self.zoom / 2, 0, 2 * math.pi)
-            cr.fill()
+    def new_cache_surface(self, surface):
+        """
+        Return a cleared window-sized ARGB surface in device pixels, reusing
+        surface when the size and scale fit.
+        """
+        scale = self.get_scale_factor()
+        width = self.get_allocated_width() * scale
+        height = self.get_allocated_height() * scale
+        if (surface is None or surface.get_width() != width or surface.get_height() != height
+                or surface.get_device_scale() != (scale, scale)):
+            surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, width, height)
+            surface.set_device_scale(scale, scale)
+            return surface
+        cr = cairo.Context(surface)
+        cr.set_operator(cairo.OPERATOR_CLEAR)
+        cr.paint()
+        return surface
+
+    def layer_surface(self, layer, view_key):
+        """The layer rendered alone for view_key, redrawn only after it changed."""
+        key = (view_key, layer.version)
+        if layer.surface_key != key:
+            layer.surface = self.new_cache_surface(layer.surface)
+            cr = cairo.Context(layer.surface)
+            cr.set_line_cap(1)  # CAIRO_LINE_CAP_ROUND
+            cr.set_line_join(1)  # CAIRO_LINE_JOIN_ROUND
+            self.app.band_renderer.render(cr, [layer], self.get_view(), self.get_allocated_width(),
+                                          self.get_allocated_height(), self.app.image_store, self.app.bg_color)
+            layer.surface_key = key
+        return layer.surface
+
+    def group_surface(self, name, layers, view_key):
+        """
+        Several layers rendered together into one surface, rebuilt when any of
+        them changed. The members get no surfaces of their own.
+        """
+        key = (view_key, tuple((layer, layer.version) for layer in layers))
+        cached_key, surface = self.group_surfaces.get(name, (None, None))
+        if cached_key != key:
+            surface = self.new_cache_surface(surface)
+            cr = cairo.Context(surface)
+            cr.set_line_cap(1)  # CAIRO_LINE_CAP_ROUND
+            cr.set_line_join(1)  # CAIRO_LINE_JOIN_ROUND
+            self.app.band_renderer.render(cr, layers, self.get_view(), self.get_allocated_width(),
+                                          self.get_allocated_height(), self.app.image_store, self.app.bg_color)
+            self.group_surfaces[name] = (key, surface)
+        return surface
 
     def draw_shape(self, cr, shape):
-        """Draw a shape on the canvas."""
+        """Draw a shape on a canvas whose user space is world coordinates."""
         cr.set_source_rgb(*shape['color'])
-        cr.set_line_width(shape['size'] * self.zoom)
-
-        sx, sy = self.world_to_screen(shape['x'], shape['y'])
-        sw = shape['w'] * self.zoom
-        sh = shape['h'] * self.zoom
-
-        shape_type = shape['type']
-
-        if shape_type == 'rect':
-            # Rounded rectangle
-            radius = min(abs(sw), abs(sh)) * 0.1
-            radius = min(radius, 20)
-
-            # Handle negative dimensions
-            x = sx if sw >= 0 else sx + sw
-            y = sy if sh >= 0 else sy + sh
-            w = abs(sw)
-            h = abs(sh)
-
-            if w > 0 and h > 0:
-                # Draw rounded rectangle
-                cr.new_sub_path()
-                cr.arc(x + w - radius, y + radius, radius, -math.pi/2, 0)
-                cr.arc(x + w - radius, y + h - radius, radius, 0, math.pi/2)
-                cr.arc(x + radius, y + h - radius, radius, math.pi/2, math.pi)
-                cr.arc(x + radius, y + radius, radius, math.pi, 3*math.pi/2)
-                cr.close_path()
-                cr.stroke()
-
-        elif shape_type == 'circle':
-            # Calculate center and radius
-            cx = sx + sw / 2
-            cy = sy + sh / 2
-            radius = min(abs(sw), abs(sh)) / 2
-
-            cr.arc(cx, cy, radius, 0, 2 * math.pi)
-            cr.stroke()
-
-        elif shape_type == 'triangle':
-            # Handle negative dimensions
-            x = sx if sw >= 0 else sx + sw
-            y = sy if sh >= 0 else sy + sh
-            w = abs(sw)
-            h = abs(sh)
-
-            # Equilateral-ish triangle pointing up
-            cr.move_to(x + w / 2, y)
-            cr.line_to(x + w, y + h)
-            cr.line_to(x, y + h)
-            cr.close_path()
-            cr.stroke()
-
-        elif shape_type == 'arrow':
-            # Draw arrow from start to end point
-            x1, y1 = sx, sy
-            x2, y2 = sx + sw, sy + sh
-
-            # Arrow body
-            cr.move_to(x1, y1)
-            cr.line_to(x2, y2)
-            cr.stroke()
-
-            # Arrow head
-            arrow_length = 15 * self.zoom
-            arrow_angle = math.pi / 6  # 30 degrees
-
-            angle = math.atan2(y2 - y1, x2 - x1)
-
-            # Left part of arrow head
-            cr.move_to(x2, y2)
-            cr.line_to(
-                x2 - arrow_length * math.cos(angle - arrow_angle),
-                y2 - arrow_length * math.sin(angle - arrow_angle)
-            )
-            cr.stroke()
-
-            # Right part of arrow head
-            cr.move_to(x2, y2)
-            cr.line_to(
-                x2 - arrow_length * math.cos(angle + arrow_angle),
-                y2 - arrow_length * math.sin(angle + arrow_angle)
-            )
-            cr.stroke()
-
-    def draw_text_item(self, cr, text_item):
-        """Draw a text item on the canvas."""
-        sx, sy = self.world_to_screen(text_item['x'], text_item['y'])
-
-        cr.set_source_rgb(*text_item['color'])
-        cr.select_font_face("Sans", 0, 0)  # CAIRO_FONT_SLANT_NORMAL, CAIRO_FONT_WEIGHT_NORMAL
-        cr.set_font_size(text_item['font_size'] * self.zoom)
-
-        cr.move_to(sx, sy)
-        cr.show_text(text_item['text'])
+        cr.set_line_width(shape['size'])
+        append_shape_path(cr, shape)
+        cr.stroke()
 
     def on_button_press(self, widget, event):
+        self.stop_view_animation()
+
         if event.button == 3:
             self.is_panning = True
             self.pan_start_x = event.x
@@ -349,6 +2068,10 @@ class WhiteboardArea(Gtk.DrawingArea):
         elif event.button == 1 and not self.is_panning:
             wx, wy = self.screen_to_world(event.x, event.y)
 
+            # Hidden and locked layers can't be drawn on
+            if not self.content.active_layer.editable:
+                return Gdk.EVENT_STOP
+
             # Check if text tool is active
             if self.app.current_tool == 'text':
                 self.app.show_text_input_dialog(wx, wy)
@@ -381,7 +2104,11 @@ class WhiteboardArea(Gtk.DrawingArea):
                 'size': self.brush_size,
                 'is_eraser': self.app.eraser_mode
             }
-            self.queue_draw()
+            # Tablets report pen pressure; strokes from a mouse stay constant width
+            has_pressure, pressure = event.get_axis(Gdk.AxisUse.PRESSURE)
+            if has_pressure:
+                self.current_stroke['pressures'] = [pressure]
+            self.ink.begin(event)
             return Gdk.EVENT_STOP
 
         return Gdk.EVENT_PROPAGATE
@@ -410,7 +2137,11 @@ class WhiteboardArea(Gtk.DrawingArea):
             # Brush drawing
             if self.current_stroke is not None:
                 self.current_stroke['points'].append((wx, wy))
-                self.queue_draw()
+                pressures = self.current_stroke.get('pressures')
+                if pressures is not None:
+                    has_pressure, pressure = event.get_axis(Gdk.AxisUse.PRESSURE)
+                    pressures.append(pressure if has_pressure else pressures[-1])
+                self.ink.add_sample(event)
             return Gdk.EVENT_STOP
 
         return Gdk.EVENT_PROPAGATE
@@ -424,61 +2155,1397 @@ class WhiteboardArea(Gtk.DrawingArea):
         elif event.button == 1:
             # Shape creation
             if self.current_shape is not None:
-                if abs(self.current_shape['w']) > 5 or abs(self.current_shape['h']) > 5:
-                    self.shapes.append(self.current_shape)
+                shape = self.current_shape
                 self.current_shape = None
-                self.queue_draw()
+                if abs(shape['w']) > 5 or abs(shape['h']) > 5:
+                    self.content.commit('shapes', shape)
+                    self.content_changed(shape_bounds(shape))
+                else:
+                    self.queue_draw()
                 return Gdk.EVENT_STOP
 
             # Stroke creation
             if self.current_stroke is not None:
-                if len(self.current_stroke['points']) > 0:
-                    self.strokes.append(self.current_stroke)
+                stroke = self.current_stroke
                 self.current_stroke = None
-                self.queue_draw()
+                self.ink.end()
+                if len(stroke['points']) > 0:
+                    if 'pressures' in stroke:
+                        # Tessellate once; frames then fill the cached polygon
+                        stroke['outline'] = stroke_outline(stroke['points'], stroke['pressures'], stroke['size'])
+                    elif self.app.fit_curves:
+                        self.fit_stroke(stroke)
+                    self.content.commit('strokes', stroke)
+                    self.content_changed(stroke_bounds(stroke))
+                else:
+                    self.queue_draw()
                 return Gdk.EVENT_STOP
 
         return Gdk.EVENT_PROPAGATE
 
+    def fit_stroke(self, stroke):
+        """
+        Replace a committed stroke's samples with fitted Bezier curves,
+        within CURVE_TOLERANCE screen pixels at the zoom it was drawn at and
+        never more than CURVE_TOLERANCE world units, so strokes drawn zoomed
+        out stay in place when zooming in.
+        """
+        curves = fit_bezier(stroke['points'], CURVE_TOLERANCE / max(self.zoom, 1.0))
+        if curves is not None:
+            stroke['curves'] = curves
+            del stroke['points']
+
     def add_text(self, text, x, y):
         """Add text at the specified world coordinates."""
         if text.strip():
-            self.text_items.append({
+            text_item = {
                 'text': text,
                 'x': x,
                 'y': y,
                 'color': self.app.brush_color,
                 'font_size': max(12, self.brush_size * 4)
-            })
-            self.queue_draw()
+            }
+            self.content.commit('text_items', text_item)
+            self.content_changed(text_bounds(text_item))
+
+    def add_vector(self, path, x, y):
+        """
+        Add an SVG, or every page of a PDF stacked downwards, at the specified
+        world coordinates. Pages stay vectors and are rasterized when drawn.
+        """
+        if not self.content.active_layer.editable:
+            return
+        source = self.app.vector_store.open(path)
+        bounds = None
+        # Page sizes are read without rendering; pages are rasterized only when seen
+        for index in range(source.n_pages):
+            width, height = source.page_size(index)
+            item = {
+                'path': path,
+                'page': index,
+                'source': source,
+                'x': x,
+                'y': y,
+                'width': width,
+                'height': height
+            }
+            y += height + VECTOR_PAGE_GAP
+            self.content.commit('vectors', item)
+            bounds = image_bounds(item) if bounds is None else union_rect(bounds, image_bounds(item))
+        self.content_changed(bounds)
 
     def add_image(self, pixbuf, x, y):
         """Add an image at the specified world coordinates."""
-        # Scale large images down
-        max_size = 500
-        width = pixbuf.get_width()
-        height = pixbuf.get_height()
-
-        if width > max_size or height > max_size:
-            scale = min(max_size / width, max_size / height)
-            width = int(width * scale)
-            height = int(height * scale)
-            pixbuf = pixbuf.scale_simple(width, height, GdkPixbuf.InterpType.BILINEAR)
-
-        self.images.append({
-            'pixbuf': pixbuf,
+        if not self.content.active_layer.editable:
+            return
+        pixbuf, (width, height) = fit_image(pixbuf, self.get_scale_factor())
+        img = {
+            'key': self.app.image_store.acquire(pixbuf),
             'x': x,
             'y': y,
             'width': width,
             'height': height
-        })
+        }
+        self.content.commit('images', img)
+        self.app.image_store.acquire(None, key=img['key'], history=True)  # the timeline's reference
+        self.content_changed(image_bounds(img))
+
+
+class InkOverlay(Gtk.DrawingArea):
+    """
+    Transparent layer above the board that draws the stroke being inked.
+
+    Each pen sample invalidates only the screen rectangle around the newest
+    points, so the board below just recomposites its cached surfaces there
+    instead of redrawing a frame. The stroke is extended by a short tail
+    predicted from the recent pen velocity, which is replaced as soon as the
+    real sample arrives. The path of the part of the stroke that further
+    samples no longer change is cached, so a frame only builds the last few
+    segments and the tail. Times from each pen event to the presentation of
+    the frame showing it and the distance between each tail and the sample
+    that replaced it are kept for report(); event times share the frame
+    clock's monotonic time base, in milliseconds.
+    """
+
+    def __init__(self, board):
+        super().__init__()
+        self.board = board
+        board.ink = self
+        self.sample_times = []      # event time (µs) of each point of the live stroke
+        self.unpainted = []         # event times (ms) of samples not drawn yet
+        self.painted = []           # (frame counter, event times) of frames not presented yet
+        self.tail = None            # predicted world point drawn after the last sample
+        self.prefix_path = None     # world-space path of the settled start of the stroke
+        self.settled = 0            # spline segments, or outline samples, in prefix_path
+        self.dirty_rect = None      # screen rectangle last invalidated around the stroke end
+        self.expire_source = None
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)          # ms
+        self.prediction_errors = deque(maxlen=LATENCY_SAMPLES)  # screen pixels
+        self.connect("draw", self.on_draw)
+
+    def begin(self, event):
+        """The board started a stroke at the first sample, from event."""
+        self.sample_times = [event.get_time() * 1000]
+        self.unpainted = [event.get_time()]
+        self.tail = None
+        self.prefix_path = None
+        self.settled = 0
+        self.dirty_rect = None
+        self.invalidate(self.board.current_stroke['points'])
+
+    def add_sample(self, event):
+        """The board appended a point to the live stroke, from event."""
+        now = event.get_time() * 1000
+        points = self.board.current_stroke['points']
+        if self.tail is not None:
+            # Where the previous samples would have put the pen right now
+            guess = self.predict(points, len(points) - 2, now)
+            if guess is not None:
+                x, y = points[-1]
+                self.prediction_errors.append(math.hypot(guess[0] - x, guess[1] - y) * self.board.zoom)
+        self.sample_times.append(now)
+        self.unpainted.append(event.get_time())
+        self.tail = self.predict(points, len(points) - 1, now + PREDICTION_HORIZON * 1e6)
+
+        # Catmull-Rom segments only move near the end, except on short strokes
+        recent = points[-4:] if len(points) > 8 else list(points)
+        if self.tail is not None:
+            recent.append(self.tail)
+        self.invalidate(recent)
+
+        # A pen held still keeps its last tail only briefly
+        if self.expire_source is not None:
+            GLib.source_remove(self.expire_source)
+        self.expire_source = GLib.timeout_add(int(VELOCITY_WINDOW * 1000), self.expire_tail)
+
+    def end(self):
+        """The live stroke was committed or dropped; the board redraws it."""
+        if self.expire_source is not None:
+            GLib.source_remove(self.expire_source)
+            self.expire_source = None
+        self.sample_times = []
+        self.unpainted = []
+        self.tail = None
+        self.prefix_path = None
+        self.settled = 0
+        self.dirty_rect = None
+
+    def expire_tail(self):
+        self.expire_source = None
+        if self.tail is not None and self.board.current_stroke is not None:
+            self.tail = None
+            self.invalidate(self.board.current_stroke['points'][-4:])
+        return False
+
+    def predict(self, points, last, at):
+        """
+        Extrapolate the pen to time at (µs) from the velocity of the samples
+        up to points[last], or None when there is no recent motion.
+        """
+        if last < 1 or at - self.sample_times[last] > VELOCITY_WINDOW * 1e6:
+            return None
+        times = self.sample_times
+        first = last
+        while first > 0 and times[last] - times[first - 1] <= VELOCITY_WINDOW * 1e6:
+            first -= 1
+        elapsed = times[last] - times[first]
+        if elapsed <= 0:
+            return None
+        ahead = (at - times[last]) / elapsed
+        x, y = points[last]
+        dx = (x - points[first][0]) * ahead
+        dy = (y - points[first][1]) * ahead
+        length = math.hypot(dx, dy) * self.board.zoom
+        if length > MAX_PREDICTION:
+            dx *= MAX_PREDICTION / length
+            dy *= MAX_PREDICTION / length
+        return (x + dx, y + dy)
+
+    def invalidate(self, world_points):
+        """Queue a redraw of the points' screen rectangle and of the previous one."""
+        board = self.board
+        pad = board.current_stroke['size'] * board.zoom / 2 + 2
+        xs, ys = zip(*(board.world_to_screen(x, y) for x, y in world_points))
+        rect = (min(xs) - pad, min(ys) - pad, max(xs) + pad, max(ys) + pad)
+        old, self.dirty_rect = self.dirty_rect, rect
+        if old is not None:
+            rect = (min(rect[0], old[0]), min(rect[1], old[1]),
+                    max(rect[2], old[2]), max(rect[3], old[3]))
+        x0, y0 = math.floor(rect[0]), math.floor(rect[1])
+        self.queue_draw_area(x0, y0, math.ceil(rect[2]) - x0, math.ceil(rect[3]) - y0)
+
+    def on_draw(self, widget, cr):
+        stroke = self.board.current_stroke
+        if not stroke or not stroke['points']:
+            return False
+        clock = self.get_frame_clock()
+        if self.unpainted:
+            self.painted.append((clock.get_frame_counter(), self.unpainted))
+            self.unpainted = []
+        self.collect_latencies()
+
+        cr.set_line_cap(1)  # CAIRO_LINE_CAP_ROUND
+        cr.set_line_join(1)  # CAIRO_LINE_JOIN_ROUND
+        cr.save()
+        self.board.apply_world_transform(cr)
+        cr.set_source_rgb(*stroke['color'])
+        if 'pressures' in stroke:
+            self.append_outline(cr, stroke)
+            cr.fill()
+        else:
+            cr.set_line_width(stroke['size'])
+            self.append_line(cr, stroke)
+            cr.stroke()
+        cr.restore()
+        return False
+
+    def append_line(self, cr, stroke):
+        """Add the live stroke's spline, as append_stroke_path() would, reusing the settled segments."""
+        points = stroke['points']
+        full = points + [self.tail] if self.tail is not None else points
+        if len(full) < 4:
+            append_stroke_path(cr, {'points': full})
+            return
+
+        # A segment is final once the sample after its end point has arrived
+        settled = len(points) - 3
+        if self.prefix_path is None:
+            cr.move_to(*full[0])
+        else:
+            cr.append_path(self.prefix_path)
+        if self.settled < settled:
+            for x, y in catmull_rom_segments(points, self.settled, settled, num_segments=5):
+                cr.line_to(x, y)
+            self.prefix_path = cr.copy_path()
+            self.settled = settled
+        for x, y in catmull_rom_segments(full, self.settled, len(full) - 3, num_segments=5) + full[-2:]:
+            cr.line_to(x, y)
+
+    def append_outline(self, cr, stroke):
+        """
+        Add the outline of a live pressure-sensitive stroke as overlapping
+        pieces of LIVE_OUTLINE_CHUNK samples, which fill as their union.
+        """
+        points = stroke['points']
+        pressures = stroke['pressures']
+        if self.prefix_path is not None:
+            cr.append_path(self.prefix_path)
+        if len(points) - self.settled > LIVE_OUTLINE_CHUNK + 1:
+            while len(points) - self.settled > LIVE_OUTLINE_CHUNK + 1:
+                end = self.settled + LIVE_OUTLINE_CHUNK + 1
+                outline = stroke_outline(points[self.settled:end], pressures[self.settled:end], stroke['size'])
+                append_stroke_path(cr, {'outline': outline})
+                self.settled += LIVE_OUTLINE_CHUNK
+            self.prefix_path = cr.copy_path()
+
+        points = points[self.settled:]
+        pressures = pressures[self.settled:]
+        if self.tail is not None:
+            points = points + [self.tail]
+            pressures = pressures + [pressures[-1]]
+        append_stroke_path(cr, {'outline': stroke_outline(points, pressures, stroke['size'])})
+
+    def collect_latencies(self):
+        """Record event-to-presentation times of the frames the clock has finished with."""
+        clock = self.get_frame_clock()
+        if clock is None:
+            return
+        pending = []
+        for frame, times in self.painted:
+            timings = clock.get_timings(frame)
+            if timings is None:
+                continue            # dropped from the clock's history
+            if not timings.get_complete():
+                pending.append((frame, times))
+                continue
+            shown = timings.get_presentation_time() or timings.get_predicted_presentation_time()
+            if shown:
+                # Event times are 32-bit milliseconds and wrap around
+                self.latencies.extend((shown / 1000 - t) % 2 ** 32 for t in times)
+        self.painted = pending
+
+    def report(self):
+        """Human readable summary of inking latency and prediction accuracy."""
+        self.collect_latencies()
+        if not self.latencies:
+            return "Inking latency: no strokes drawn yet"
+        ordered = sorted(self.latencies)
+        median = ordered[len(ordered) // 2]
+        p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+        text = (f"Inking latency: median {median:.1f} ms, 95th percentile {p95:.1f} ms, "
+                f"worst {ordered[-1]:.1f} ms over {len(ordered)} samples")
+        if self.prediction_errors:
+            mean = sum(self.prediction_errors) / len(self.prediction_errors)
+            text += f"\nPredicted tail error: {mean:.1f} px on average"
+        return text
+
+
+class Minimap(Gtk.DrawingArea):
+    """
+    Overview of the whole board with the current viewport marked.
+
+    The board is kept in a low-resolution raster covering a square of world
+    space. Committed items only redraw their own rectangle of the raster, and
+    when content grows past the square it doubles in size by resampling the
+    raster, so the full board is re-rendered only on clear, page switch or
+    theme change. Clicking or dragging centers the board on that point.
+    """
+
+    RASTER_SIZE = 512
+    PADDING = 6
+
+    def __init__(self, board):
+        super().__init__()
+        self.board = board
+        self.raster = None
+        self.extent = None          # (x0, y0, size): world square covered by the raster
+        self.content_bounds = None
+        self.dirty = []             # world rectangles waiting to be redrawn in the raster
+        self.flush_source = None
+        self.drag_mapping = None
+
+        self.set_size_request(200, 150)
+        self.set_events(
+            Gdk.EventMask.BUTTON_PRESS_MASK |
+            Gdk.EventMask.BUTTON_MOTION_MASK |
+            Gdk.EventMask.BUTTON_RELEASE_MASK
+        )
+        self.connect("draw", self.on_draw)
+        self.connect("button-press-event", self.on_button_press)
+        self.connect("motion-notify-event", self.on_motion)
+        self.connect("button-release-event", self.on_button_release)
+        board.connect("content-changed", self.on_content_changed)
+        board.connect("view-changed", lambda b: self.queue_draw())
+
+    def on_content_changed(self, board, rect):
+        if rect is None:
+            # Everything changed: start over from the board's current bounds
+            self.content_bounds = board.content.bounds()
+            self.raster = None
+            self.extent = None
+            self.dirty = []
+            if self.content_bounds is not None:
+                self.ensure_extent(self.content_bounds)
+                self.dirty.append(self.content_bounds)
+        else:
+            if self.content_bounds is None:
+                self.content_bounds = rect
+            else:
+                self.content_bounds = union_rect(self.content_bounds, rect)
+            self.ensure_extent(rect)
+            self.dirty.append(rect)
+
+        if self.dirty and self.flush_source is None:
+            self.flush_source = GLib.idle_add(self.flush)
         self.queue_draw()
 
+    def ensure_extent(self, rect):
+        """Grow the raster's world square until it contains rect, keeping its pixels."""
+        if self.extent is None:
+            size = max(rect[2] - rect[0], rect[3] - rect[1], 1000) * 1.5
+            cx, cy = (rect[0] + rect[2]) / 2, (rect[1] + rect[3]) / 2
+            self.extent = (cx - size / 2, cy - size / 2, size)
+            self.raster = cairo.ImageSurface(cairo.FORMAT_RGB24, self.RASTER_SIZE, self.RASTER_SIZE)
+            cr = cairo.Context(self.raster)
+            cr.set_source_rgb(*self.board.app.bg_color)
+            cr.paint()
+            return
+
+        x0, y0, size = self.extent
+        covered = (x0, y0, x0 + size, y0 + size)
+        if union_rect(covered, rect) == covered:
+            return
+
+        wanted = union_rect(covered, rect)
+        new_size = size
+        while new_size < max(wanted[2] - wanted[0], wanted[3] - wanted[1]):
+            new_size *= 2
+        new_x0 = (wanted[0] + wanted[2] - new_size) / 2
+        new_y0 = (wanted[1] + wanted[3] - new_size) / 2
+
+        raster = cairo.ImageSurface(cairo.FORMAT_RGB24, self.RASTER_SIZE, self.RASTER_SIZE)
+        cr = cairo.Context(raster)
+        cr.set_source_rgb(*self.board.app.bg_color)
+        cr.paint()
+        scale = self.RASTER_SIZE / new_size
+        cr.translate((x0 - new_x0) * scale, (y0 - new_y0) * scale)
+        cr.scale(size / new_size, size / new_size)
+        cr.set_source_surface(self.raster, 0, 0)
+        cr.paint()
+
+        self.raster = raster
+        self.extent = (new_x0, new_y0, new_size)
+
+    def flush(self):
+        """Redraw the dirty rectangles of the raster from the board's items."""
+        self.flush_source = None
+        if self.raster is None:
+            self.dirty = []
+            return False
+
+        x0, y0, size = self.extent
+        scale = self.RASTER_SIZE / size
+        cr = cairo.Context(self.raster)
+        cr.scale(scale, scale)
+        cr.translate(-x0, -y0)
+        cr.set_line_cap(1)  # CAIRO_LINE_CAP_ROUND
+        cr.set_line_join(1)  # CAIRO_LINE_JOIN_ROUND
+
+        app = self.board.app
+        for rect in self.dirty:
+            cr.save()
+            cr.rectangle(rect[0], rect[1], rect[2] - rect[0], rect[3] - rect[1])
+            cr.clip()
+            cr.set_source_rgb(*app.bg_color)
+            cr.paint()
+            self.board.content.draw(cr, rect, app.image_store, app.bg_color)
+            cr.restore()
+        self.dirty = []
+
+        self.queue_draw()
+        return False
+
+    def get_mapping(self):
+        """Scale and offset mapping world coordinates into the widget, fitting content and viewport."""
+        view = self.board.visible_world_rect()
+        bounds = view if self.content_bounds is None else union_rect(self.content_bounds, view)
+        width = self.get_allocated_width() - 2 * self.PADDING
+        height = self.get_allocated_height() - 2 * self.PADDING
+        scale = min(width / max(bounds[2] - bounds[0], 1), height / max(bounds[3] - bounds[1], 1))
+        dx = self.PADDING + (width - (bounds[2] - bounds[0]) * scale) / 2 - bounds[0] * scale
+        dy = self.PADDING + (height - (bounds[3] - bounds[1]) * scale) / 2 - bounds[1] * scale
+        return scale, dx, dy
+
+    def on_draw(self, widget, cr):
+        width = self.get_allocated_width()
+        height = self.get_allocated_height()
+        cr.set_source_rgba(0.12, 0.12, 0.12, 0.85)
+        cr.rectangle(0, 0, width, height)
+        cr.fill()
+
+        scale, dx, dy = self.drag_mapping or self.get_mapping()
+
+        if self.raster is not None:
+            x0, y0, size = self.extent
+            cr.save()
+            cr.rectangle(self.PADDING, self.PADDING, width - 2 * self.PADDING, height - 2 * self.PADDING)
+            cr.clip()
+            cr.translate(dx + x0 * scale, dy + y0 * scale)
+            cr.scale(size * scale / self.RASTER_SIZE, size * scale / self.RASTER_SIZE)
+            cr.set_source_surface(self.raster, 0, 0)
+            cr.paint()
+            cr.restore()
+
+        # Current viewport
+        vx0, vy0, vx1, vy1 = self.board.visible_world_rect()
+        cr.set_source_rgb(0.31, 0.55, 0.78)
+        cr.set_line_width(1.5)
+        cr.rectangle(vx0 * scale + dx, vy0 * scale + dy, (vx1 - vx0) * scale, (vy1 - vy0) * scale)
+        cr.stroke()
+
+    def navigate(self, x, y):
+        """Center the board on the world point under widget position (x, y)."""
+        scale, dx, dy = self.drag_mapping
+        wx, wy = (x - dx) / scale, (y - dy) / scale
+        board = self.board
+        board.stop_view_animation()
+        board.offset_x = board.get_allocated_width() / 2 - wx * board.zoom
+        board.offset_y = board.get_allocated_height() / 2 - wy * board.zoom
+        board.queue_draw()
+
+    def on_button_press(self, widget, event):
+        if event.button == 1:
+            # Freeze the mapping so the map does not rescale under the pointer
+            self.drag_mapping = self.get_mapping()
+            self.navigate(event.x, event.y)
+            return Gdk.EVENT_STOP
+        return Gdk.EVENT_PROPAGATE
+
+    def on_motion(self, widget, event):
+        if self.drag_mapping is not None:
+            self.navigate(event.x, event.y)
+            return Gdk.EVENT_STOP
+        return Gdk.EVENT_PROPAGATE
+
+    def on_button_release(self, widget, event):
+        if event.button == 1 and self.drag_mapping is not None:
+            self.drag_mapping = None
+            self.queue_draw()
+            return Gdk.EVENT_STOP
+        return Gdk.EVENT_PROPAGATE
+
+
+class Playback:
+    """
+    Replays the timeline of the board's page. The board is given a read-only
+    BoardContent holding copies of the items committed up to the playback
+    time, so frames go through the normal drawing path. Playing forward
+    appends the next operations to it; seeking anywhere else rebuilds it
+    from the nearest keyframe.
+    """
+
+    SPEEDS = (1, 2, 5, 10, 20, 50)
+    ITEM_BOUNDS = {'strokes': stroke_bounds, 'shapes': shape_bounds, 'text_items': text_bounds,
+                   'images': image_bounds, 'vectors': image_bounds}
+
+    def __init__(self, board, on_tick=None):
+        self.board = board
+        self.source = board.content
+        self.timeline = self.source.timeline
+        self.image_store = board.app.image_store
+        self.on_tick = on_tick      # called after every frame of playback
+        self.start = self.timeline.start
+        self.end = self.timeline.times[-1] if self.timeline.times else self.start
+        self.speed = 1
+        self.tick_id = None
+        self.last_frame = None
+
+        # Copies need the geometry of evicted and cleared strokes
+        batches = [batch for layer in self.source.layers for batch in layer.stroke_batches.batches]
+        for batch in batches + self.timeline.archive:
+            if batch.spilled is not None:
+                batch.restore()
+
+        # Removed layers play below the live ones
+        self.order = [layer for layer in self.timeline.layers if layer not in self.source.layers]
+        self.order += self.source.layers
+        self.rebuild(0)
+        self.time = self.start
+
+    @property
+    def playing(self):
+        return self.tick_id is not None
+
+    def new_layer(self, content, layer):
+        copy = Layer(layer.name, content.text_index)
+        copy.locked = True
+        return copy
+
+    def add_copy(self, layer, kind, item):
+        copy = dict(item)
+        if kind == 'images':
+            self.image_store.acquire(None, key=copy['key'])
+        elif kind == 'text_items':
+            self.copies[id(item)] = copy
+        getattr(layer, kind).append(copy)
+        if kind == 'text_items':
+            layer.text_index.add(copy)
+        layer.version += 1
+        return copy
+
+    def rebuild(self, n):
+        """Show the board after the first n operations, starting from the nearest keyframe."""
+        content = BoardContent()
+        content.layers = [self.new_layer(content, layer) for layer in self.order]
+        content.active = len(content.layers) - 1
+        self.layer_map = dict(zip(self.order, content.layers))
+        self.copies = {}            # id of a source text item -> its copy, for removals
+        for layer, kinds in self.timeline.state(n).items():
+            for kind, items in kinds.items():
+                for item in items:
+                    self.add_copy(self.layer_map[layer], kind, item)
+
+        if self.board.content is not self.source:
+            self.board.content.clear(self.image_store)
+        self.content = content
+        self.position = n
+        self.board.set_content(content, self.board.get_view())
+
+    def advance(self, n):
+        """Apply the operations from the current position up to n."""
+        rect = None
+        full = False
+        for op, layer, kind, item in self.timeline.ops[self.position:n]:
+            target = self.layer_map.get(layer)
+            if op == 'add':
+                bounds = self.ITEM_BOUNDS[kind](self.add_copy(target, kind, item))
+                rect = bounds if rect is None else union_rect(rect, bounds)
+            elif op == 'remove':
+                copy = self.copies.pop(id(item), None)
+                if copy is not None and target.remove_text_item(copy):
+                    bounds = text_bounds(copy)
+                    rect = bounds if rect is None else union_rect(rect, bounds)
+            else:
+                for cleared in (self.content.layers if target is None else [target]):
+                    cleared.clear(self.image_store)
+                full = True
+        self.position = n
+
+        if full:
+            self.board.content_changed()
+        elif rect is not None:
+            self.board.content_changed(rect)
+
+    def seek(self, when):
+        """Show the board as it was at time when."""
+        self.time = min(max(when, self.start), self.end)
+        n = bisect.bisect_right(self.timeline.times, self.time)
+        if self.position <= n <= self.position + KEYFRAME_INTERVAL:
+            self.advance(n)
+        else:
+            self.rebuild(n)
+
+    def play(self):
+        if self.playing:
+            return
+        if self.time >= self.end:
+            self.seek(self.start)
+        self.last_frame = None
+        self.tick_id = self.board.add_tick_callback(self.tick)
+
+    def pause(self):
+        if self.tick_id is not None:
+            self.board.remove_tick_callback(self.tick_id)
+            self.tick_id = None
+
+    def tick(self, widget, frame_clock):
+        now = frame_clock.get_frame_time() / 1e6
+        if self.last_frame is not None:
+            self.seek(self.time + (now - self.last_frame) * self.speed)
+        self.last_frame = now
+
+        done = self.time >= self.end
+        if done:
+            self.tick_id = None
+        if self.on_tick is not None:
+            self.on_tick(self)
+        return GLib.SOURCE_REMOVE if done else GLib.SOURCE_CONTINUE
+
+    def close(self):
+        """Stop and give the board its live content back."""
+        self.pause()
+        self.content.clear(self.image_store)
+        self.board.set_content(self.source, self.board.get_view())
+
+
+def pack_stroke(stroke, geometry=()):
+    """Picklable copy of a stroke, with geometry overriding its own keys."""
+    packed = dict(stroke)
+    packed.update(geometry)
+    if 'points' in packed:
+        packed['points'] = array('f', [c for point in packed['points'] for c in point])
+    if 'pressures' in packed:
+        packed['pressures'] = array('f', packed['pressures'])
+        packed.pop('outline', None)
+    return packed
+
+
+def unpack_stroke(stroke):
+    """Undo pack_stroke() in place; strokes already unpacked are left alone."""
+    if isinstance(stroke.get('points'), array):
+        flat = stroke['points']
+        stroke['points'] = list(zip(flat[0::2], flat[1::2]))
+    if isinstance(stroke.get('pressures'), array):
+        stroke['pressures'] = list(stroke['pressures'])
+        stroke['outline'] = stroke_outline(stroke['points'], stroke['pressures'], stroke['size'])
+
+
+def snapshot_content(content):
+    """
+    Shallow copies of the lists pack_content() reads, cheap enough to take on
+    the main thread so that packing can run in a worker while items are
+    still added to the board.
+    """
+    layers = []
+    for layer in content.layers:
+        layers.append({
+            'layer': layer,
+            'name': layer.name,
+            'visible': layer.visible,
+            'locked': layer.locked,
+            'strokes': list(layer.strokes),
+            'shapes': list(layer.shapes),
+            'text_items': list(layer.text_items),
+            'images': list(layer.images),
+            'vectors': list(layer.vectors),
+            'spilled': [(list(batch.items), batch.spilled) for batch in layer.stroke_batches.batches
+                        if batch.spilled is not None],
+        })
+    timeline = content.timeline
+    return {'layers': layers, 'active': content.active,
+            'timeline': {'start': timeline.start, 'times': list(timeline.times), 'ops': list(timeline.ops),
+                         'spilled': [(list(batch.items), batch.spilled) for batch in timeline.archive
+                                     if batch.spilled is not None]}}
+
+
+def snapshot_images(snapshot):
+    """Store keys of the image items of a snapshot, its timeline included."""
+    keys = {img['key'] for layer in snapshot['layers'] for img in layer['images']}
+    keys.update(item['key'] for op, layer, kind, item in snapshot['timeline']['ops']
+                if op == 'add' and kind == 'images')
+    return keys
+
+
+def pack_content(snapshot):
+    """
+    Convert a snapshot_content() of a board to a compact picklable form. Stroke
+    points and pressures become flat float arrays (fitted curves already are)
+    and cached outlines are dropped; image items keep only their store key.
+    Geometry of evicted stroke batches is read back from its spill file.
+    Timeline operations share the packed items of the layers and refer to
+    layers by index, removed layers coming after the live ones.
+    """
+    packed_items = {}               # id of an item -> its packed form
+    spilled = {}                    # id of an evicted stroke -> its geometry
+    for items, geometry_range in itertools.chain(snapshot['timeline']['spilled'],
+                                                 *(layer['spilled'] for layer in snapshot['layers'])):
+        for item, geometry in zip(items, PathBatch.read_geometry(geometry_range)):
+            spilled[id(item)] = geometry
+
+    layers = []
+    for layer in snapshot['layers']:
+        for stroke in layer['strokes']:
+            packed_items[id(stroke)] = pack_stroke(stroke, spilled.get(id(stroke), ()))
+        for item in layer['vectors']:
+            packed_items[id(item)] = {k: v for k, v in item.items() if k != 'source'}
+        layers.append({
+            'name': layer['name'],
+            'visible': layer['visible'],
+            'locked': layer['locked'],
+            'strokes': [packed_items[id(stroke)] for stroke in layer['strokes']],
+            'shapes': layer['shapes'],
+            'text_items': layer['text_items'],
+            'images': layer['images'],
+            'vectors': [packed_items[id(item)] for item in layer['vectors']],
+        })
+
+    timeline = snapshot['timeline']
+    layer_index = {layer['layer']: i for i, layer in enumerate(snapshot['layers'])}
+    removed = []
+    ops = []
+    for op, layer, kind, item in timeline['ops']:
+        if layer is not None and layer not in layer_index:
+            layer_index[layer] = len(layer_index)
+            removed.append(layer.name)
+        if item is not None and kind in ('strokes', 'vectors'):
+            # Cleared items are only in the timeline
+            if id(item) not in packed_items:
+                packed_items[id(item)] = (pack_stroke(item, spilled.get(id(item), ())) if kind == 'strokes'
+                                          else {k: v for k, v in item.items() if k != 'source'})
+            item = packed_items[id(item)]
+        ops.append((op, None if layer is None else layer_index[layer], kind, item))
+
+    return {
+        'layers': layers,
+        'active': snapshot['active'],
+        'timeline': {'start': timeline['start'], 'times': timeline['times'], 'ops': ops, 'removed': removed},
+    }
+
+
+def unpack_content(data):
+    """Rebuild a BoardContent from pack_content() output, with its caches primed."""
+    content = BoardContent()
+    content.layers = []
+    for layer_data in data['layers']:
+        layer = Layer(layer_data['name'], content.text_index)
+        layer.visible = layer_data['visible']
+        layer.locked = layer_data['locked']
+        for stroke in layer_data['strokes']:
+            unpack_stroke(stroke)
+            layer.strokes.append(stroke)
+        layer.shapes = layer_data['shapes']
+        for text_item in layer_data['text_items']:
+            layer.add_text_item(text_item)
+        layer.images = layer_data['images']
+        # Sources are reopened on the main thread, see PageManager.finish_rehydrate()
+        for item in layer_data['vectors']:
+            item['source'] = None
+        layer.vectors = layer_data['vectors']
+        layer.sync_caches()
+        content.layers.append(layer)
+    content.active = data['active']
+
+    # Pickling kept the items shared between the layers and the timeline
+    timeline_data = data['timeline']
+    layers = content.layers + [Layer(name, content.text_index) for name in timeline_data['removed']]
+    content.timeline.start = timeline_data['start']
+    for when, (op, index, kind, item) in zip(timeline_data['times'], timeline_data['ops']):
+        if kind == 'strokes' and op == 'add':
+            unpack_stroke(item)
+        elif kind == 'vectors' and op == 'add':
+            item.setdefault('source', None)
+        content.timeline.record(op, None if index is None else layers[index], kind, item, when)
+    live = {id(stroke) for layer in content.layers for stroke in layer.strokes}
+    content.timeline.keep_strokes([stroke for stroke in content.timeline.items('strokes') if id(stroke) not in live])
+    return content
+
+
+class Page:
+    """One board of the session, resident or spilled to disk."""
+
+    def __init__(self, name, content):
+        self.name = name
+        self.content = content      # placeholder items only while state is 'loading'
+        self.view = (0, 0, 1.0)     # offset_x, offset_y, zoom
+        self.thumbnail = None       # cairo.ImageSurface
+        self.state = 'resident'     # 'resident', 'spilling', 'spilled', 'loading'
+        self.generation = 0         # bumped on activation; stale spills are discarded
+        self.spill_generation = None  # generation whose spill file holds the page
+        self.memory = 0
+        self.last_active = time.monotonic()
+
+
+class PageManager:
+    """
+    Keeps one page live in the WhiteboardArea and a thumbnail for every other.
+
+    Switching only swaps the BoardContent and view, so it does not depend on
+    page count or size. When inactive pages use more than memory_threshold
+    bytes, the least recently used ones are written to a spill directory in
+    a background thread and read back, again in the background, on activation.
+    """
+
+    THUMBNAIL_WIDTH = 160
+    THUMBNAIL_HEIGHT = 100
+
+    def __init__(self, app, board, memory_threshold=64 * 1024 * 1024):
+        self.app = app
+        self.board = board
+        self.memory_threshold = memory_threshold
+        self.pages = [Page("Page 1", board.content)]
+        self.active = 0
+        self.spill_dir = None
+
+    @property
+    def active_page(self):
+        return self.pages[self.active]
+
+    def add_page(self):
+        """Append an empty page and switch to it."""
+        self.pages.append(Page(f"Page {len(self.pages) + 1}", BoardContent()))
+        self.activate(len(self.pages) - 1)
+
+    def activate(self, index):
+        if index == self.active or not 0 <= index < len(self.pages):
+            return
+
+        old = self.active_page
+        old.content = self.board.content
+        old.view = self.board.get_view()
+        old.last_active = time.monotonic()
+        GLib.idle_add(self.finish_deactivate, old)
+
+        self.active = index
+        page = self.active_page
+        page.generation += 1
+        if page.state == 'spilling':
+            page.state = 'resident'
+        elif page.state == 'spilled':
+            if page.content is None:
+                page.content = BoardContent()   # placeholder until the worker is done
+            page.state = 'loading'
+            args = (page, page.spill_generation)
+            threading.Thread(target=self.rehydrate, args=args, daemon=True).start()
+        self.board.set_content(page.content, page.view)
+
+    def finish_deactivate(self, page):
+        """Refresh the thumbnail of a page that just went inactive, then trim memory."""
+        if page is not self.active_page and page.state == 'resident':
+            self.update_thumbnail(page)
+            page.memory = page.content.memory_estimate(self.app.image_store)
+            self.enforce_threshold()
+        return False
+
+    def update_thumbnail(self, page):
+        scale = self.board.get_scale_factor()
+        surface = cairo.ImageSurface(cairo.FORMAT_RGB24, self.THUMBNAIL_WIDTH * scale, self.THUMBNAIL_HEIGHT * scale)
+        surface.set_device_scale(scale, scale)
+        cr = cairo.Context(surface)
+        cr.set_source_rgb(*self.app.bg_color)
+        cr.paint()
+        cr.set_line_cap(1)  # CAIRO_LINE_CAP_ROUND
+        cr.set_line_join(1)  # CAIRO_LINE_JOIN_ROUND
+
+        bounds = page.content.bounds()
+        if bounds is not None:
+            width = max(bounds[2] - bounds[0], 1)
+            height = max(bounds[3] - bounds[1], 1)
+            scale = min(self.THUMBNAIL_WIDTH / width, self.THUMBNAIL_HEIGHT / height)
+            cr.translate((self.THUMBNAIL_WIDTH - width * scale) / 2, (self.THUMBNAIL_HEIGHT - height * scale) / 2)
+            cr.scale(scale, scale)
+            cr.translate(-bounds[0], -bounds[1])
+            page.content.draw(cr, bounds, self.app.image_store, self.app.bg_color)
+        page.thumbnail = surface
+
+    def enforce_threshold(self):
+        """Spill least recently used inactive pages until they fit the threshold."""
+        resident = [p for p in self.pages if p is not self.active_page and p.state == 'resident']
+        total = sum(p.memory for p in resident)
+        for page in sorted(resident, key=lambda p: p.last_active):
+            if total <= self.memory_threshold:
+                break
+            total -= page.memory
+            self.spill(page)
+
+    def spill_path(self, page, generation):
+        # One file per generation, so a stale writer cannot overwrite a newer spill
+        return os.path.join(self.spill_dir, f"page-{id(page)}-{generation}.bin")
+
+    def spill(self, page):
+        if self.spill_dir is None:
+            self.spill_dir = tempfile.mkdtemp(prefix="aboard-pages-")
+        page.state = 'spilling'
+        # Only list references are copied here; the page may be activated and
+        # drawn on while the worker packs and writes it
+        args = (page, page.content, page.generation, snapshot_content(page.content))
+        threading.Thread(target=self.write_spill, args=args, daemon=True).start()
+
+    def write_spill(self, page, content, generation, snapshot):
+        """Worker thread: write the page and any images not yet on disk."""
+        path = self.spill_path(page, generation)
+        try:
+            for key in snapshot_images(snapshot):
+                self.app.image_store.write(key, self.spill_dir)
+            data = zlib.compress(pickle.dumps(pack_content(snapshot), pickle.HIGHEST_PROTOCOL))
+            with open(path, "wb") as f:
+                f.write(data)
+        except Exception as e:
+            GLib.idle_add(self.finish_spill, page, content, generation, e)
+        else:
+            GLib.idle_add(self.finish_spill, page, content, generation)
+
+    def finish_spill(self, page, content, generation, error=None):
+        if page.generation != generation or error is not None:
+            # Activated again while being written, or the write failed; it stays resident
+            if error is not None and page.generation == generation:
+                print(f"Failed to write {page.name} to disk: {error}")
+                page.state = 'resident'
+            if os.path.exists(self.spill_path(page, generation)):
+                os.remove(self.spill_path(page, generation))
+            return False
+        for img in content.iter_layer_images():
+            self.app.image_store.release(img['key'])
+        for img in content.timeline.items('images'):
+            self.app.image_store.release(img['key'], history=True)
+        # The page file now holds the geometry of evicted batches too
+        batches = [batch for layer in content.layers for batch in layer.stroke_batches.batches]
+        for batch in batches + content.timeline.archive:
+            if batch.spilled is not None:
+                spill_file, offset, length = batch.spilled
+                spill_file.free(offset, length)
+        page.content = None
+        page.state = 'spilled'
+        page.spill_generation = generation
+        return False
+
+    def rehydrate(self, page, generation):
+        """Worker thread: load a spilled page and the images it needs."""
+        try:
+            with open(self.spill_path(page, generation), "rb") as f:
+                content = unpack_content(pickle.loads(zlib.decompress(f.read())))
+            pixbufs = {}
+            for key in {img['key'] for img in content.iter_images()}:
+                if key not in self.app.image_store.entries:
+                    pixbufs[key] = GdkPixbuf.Pixbuf.new_from_file(os.path.join(self.spill_dir, key + ".png"))
+        except Exception as e:
+            GLib.idle_add(self.fail_rehydrate, page, e)
+        else:
+            GLib.idle_add(self.finish_rehydrate, page, generation, content, pixbufs)
+
+    def fail_rehydrate(self, page, error):
+        """
+        Leave a page that could not be read back spilled, with its file, so
+        activating it again retries. Items drawn on the placeholder are kept.
+        """
+        print(f"Failed to load {page.name} from disk: {error}")
+        page.state = 'spilled'
+        return False
+
+    def finish_rehydrate(self, page, generation, content, pixbufs):
+        history = content.timeline.items('images')
+        for img, is_history in itertools.chain(((img, False) for img in content.iter_layer_images()),
+                                               ((img, True) for img in history)):
+            # Another page may have released an entry since the worker looked;
+            # it is then recreated without pixels and loaded from the spill copy
+            path = os.path.join(self.spill_dir, img['key'] + ".png")
+            self.app.image_store.acquire(pixbufs.get(img['key']), key=img['key'], path=path, history=is_history)
+        for item in content.iter_vectors():
+            try:
+                item['source'] = self.app.vector_store.open(item['path'])
+            except Exception as e:
+                print(f"Failed to reopen {item['path']}: {e}")
+        os.remove(self.spill_path(page, generation))
+
+        # Keep anything drawn on the placeholder while loading
+        content.extend(page.content)
+        page.content = content
+        page.state = 'resident'
+        if page is self.active_page:
+            # Swap in place so an in-progress stroke survives
+            self.board.content = content
+            self.board.content_changed()
+        return False
+
+    def close(self):
+        if self.spill_dir is not None:
+            shutil.rmtree(self.spill_dir, ignore_errors=True)
+
+
+class IngestServer:
+    """
+    Local endpoint for scripted content insertion.
+
+    Clients connect to a Unix socket and send JSON lines, one batch per line:
+
+        {"id": 1,
+         "strokes": [{"points": [[x, y], ...], "color": [r, g, b], "size": 3, "pressures": [...]}],
+         "shapes": [{"type": "rect", "x": 0, "y": 0, "w": 10, "h": 10, "color": [r, g, b], "size": 2}],
+         "text": [{"text": "...", "x": 0, "y": 0, "color": [r, g, b], "font_size": 16}],
+         "images": [{"path": "/abs/file.png" or "png": "<base64>", "x": 0, "y": 0, "width": w, "height": h}]}
+
+    Each batch is answered, in order, with {"id": 1, "ok": true, "added": n}
+    once it is applied or with {"id": 1, "ok": false, "error": "..."}; numbers must
+    be finite, and images are scaled down like pasted ones. A thread per
+    connection parses batches and decodes images; the main thread applies
+    each batch to the active layer as one transaction, with one text index
+    update and one redraw. At most MAX_PENDING_BATCHES parsed batches wait
+    for the main thread, after which readers stop reading and the socket
+    pushes back on the client. A line longer than MAX_BATCH_LINE is answered
+    with an error and ends the connection.
+    """
+
+    def __init__(self, app, path):
+        self.app = app
+        self.path = path
+        self.pending = queue.Queue(MAX_PENDING_BATCHES)
+        # Read by the parsing threads, which must not call into GTK
+        self.scale = app.board.get_scale_factor()
+        app.board.connect("notify::scale-factor", self.on_scale_factor_changed)
+        try:
+            mode = os.lstat(path).st_mode
+        except FileNotFoundError:
+            pass
+        else:
+            # A stale socket from an earlier run is replaced; anything else is left alone
+            if not stat.S_ISSOCK(mode):
+                raise FileExistsError(f"{path} exists and is not a socket")
+            os.remove(path)
+        self.listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.listener.bind(path)
+        self.listener.listen()
+        threading.Thread(target=self.accept, daemon=True).start()
+
+    def on_scale_factor_changed(self, board, pspec):
+        self.scale = board.get_scale_factor()
+
+    def accept(self):
+        """Worker thread: serve every client in threads of its own."""
+        while True:
+            try:
+                conn, address = self.listener.accept()
+            except OSError:
+                return              # closed
+            threading.Thread(target=self.serve, args=(conn,), daemon=True).start()
+
+    def serve(self, conn):
+        """Worker thread: parse a client's batches and queue them for the main thread."""
+        replies = queue.Queue()
+        threading.Thread(target=self.write_replies, args=(conn, replies), daemon=True).start()
+        try:
+            with conn.makefile("rb") as stream:
+                while True:
+                    line = stream.readline(MAX_BATCH_LINE + 1)
+                    if not line:
+                        break
+                    if len(line) > MAX_BATCH_LINE:
+                        error = ValueError(f"batch longer than {MAX_BATCH_LINE} bytes")
+                        self.pending.put((None, error, replies))
+                        GLib.idle_add(self.apply_next)
+                        break
+                    if not line.strip():
+                        continue
+                    batch_id = None
+                    try:
+                        request = json.loads(line, parse_constant=self.reject_constant)
+                        batch_id = request.get('id')
+                        batch = self.parse(request)
+                    except Exception as e:
+                        batch = e
+                    self.pending.put((batch_id, batch, replies))
+                    GLib.idle_add(self.apply_next)
+        except OSError:
+            pass                    # the client went away; its queued batches still apply
+        finally:
+            # Queued behind the client's batches so every reply is sent first
+            self.pending.put((None, None, replies))
+            GLib.idle_add(self.apply_next)
+
+    @staticmethod
+    def write_replies(conn, replies):
+        """Worker thread: send replies in order until the client is done."""
+        with conn:
+            while True:
+                reply = replies.get()
+                if reply is None:
+                    return
+                try:
+                    conn.sendall(json.dumps(reply).encode() + b"\n")
+                except OSError:
+                    return
+
+    @staticmethod
+    def reject_constant(name):
+        raise ValueError(f"{name} is not a valid number")
+
+    @staticmethod
+    def parse_number(value):
+        """A finite float; NaN and infinities would make the batch undrawable."""
+        number = float(value)
+        if not math.isfinite(number):
+            raise ValueError(f"{value!r} is not a finite number")
+        return number
+
+    @classmethod
+    def parse_color(cls, entry):
+        color = tuple(cls.parse_number(c) for c in entry.get('color', (0, 0, 0)))
+        if len(color) != 3:
+            raise ValueError("color needs three components")
+        return color
+
+    def parse(self, request):
+        """Convert a request to {kind: items}, plus its world bounds under 'bounds'."""
+        number = self.parse_number
+        strokes = []
+        for entry in request.get('strokes', ()):
+            points = [(number(x), number(y)) for x, y in entry['points']]
+            if not points:
+                raise ValueError("stroke without points")
+            stroke = {'points': points, 'color': self.parse_color(entry),
+                      'size': number(entry.get('size', 3)), 'is_eraser': False}
+            if 'pressures' in entry:
+                stroke['pressures'] = [number(p) for p in entry['pressures']]
+                if len(stroke['pressures']) != len(points):
+                    raise ValueError("stroke needs one pressure per point")
+                stroke['outline'] = stroke_outline(points, stroke['pressures'], stroke['size'])
+            strokes.append(stroke)
+
+        shapes = []
+        for entry in request.get('shapes', ()):
+            if entry['type'] not in ('rect', 'circle', 'triangle', 'arrow'):
+                raise ValueError(f"unknown shape type {entry['type']!r}")
+            shapes.append({'type': entry['type'], 'x': number(entry['x']), 'y': number(entry['y']),
+                           'w': number(entry['w']), 'h': number(entry['h']),
+                           'color': self.parse_color(entry), 'size': number(entry.get('size', 3))})
+
+        text_items = [{'text': str(entry['text']), 'x': number(entry['x']), 'y': number(entry['y']),
+                       'color': self.parse_color(entry), 'font_size': number(entry.get('font_size', 16))}
+                      for entry in request.get('text', ()) if str(entry['text']).strip()]
+
+        images = []
+        for entry in request.get('images', ()):
+            if 'path' in entry:
+                pixbuf = GdkPixbuf.Pixbuf.new_from_file(entry['path'])
+            else:
+                loader = GdkPixbuf.PixbufLoader()
+                loader.write(base64.b64decode(entry['png']))
+                loader.close()
+                pixbuf = loader.get_pixbuf()
+            # Scaled like a pasted image, so the same picture gets the same key
+            pixbuf, (width, height) = fit_image(pixbuf, self.scale)
+            img = {'x': number(entry['x']), 'y': number(entry['y']),
+                   'width': number(entry.get('width', width)),
+                   'height': number(entry.get('height', height))}
+            if img['width'] <= 0 or img['height'] <= 0:
+                raise ValueError("image width and height must be positive")
+            # Hashing here keeps it off the main thread
+            images.append((img, pixbuf, ImageStore.digest(pixbuf)))
+
+        bounds = None
+        for rect in ([stroke_bounds(stroke) for stroke in strokes] + [shape_bounds(shape) for shape in shapes]
+                     + [text_bounds(text_item) for text_item in text_items]
+                     + [image_bounds(img) for img, pixbuf, key in images]):
+            bounds = rect if bounds is None else union_rect(bounds, rect)
+        return {'strokes': strokes, 'shapes': shapes, 'text_items': text_items, 'images': images,
+                'bounds': bounds}
+
+    def apply_next(self):
+        """Apply one queued batch as a single transaction."""
+        batch_id, batch, replies = self.pending.get_nowait()
+        if batch is None:
+            replies.put(None)
+            return False
+        if isinstance(batch, Exception):
+            replies.put({'id': batch_id, 'ok': False, 'error': str(batch)})
+            return False
+
+        board = self.app.board
+        content = board.content
+        if not content.active_layer.editable:
+            replies.put({'id': batch_id, 'ok': False, 'error': "the active layer is hidden or locked"})
+            return False
+
+        store = self.app.image_store
+        images = []
+        for img, pixbuf, key in batch['images']:
+            img['key'] = store.acquire(pixbuf, key=key)
+            store.acquire(None, key=key, history=True)  # the timeline's reference
+            images.append(img)
+
+        added = 0
+        for kind in ('images', 'strokes', 'shapes', 'text_items'):
+            items = images if kind == 'images' else batch[kind]
+            if items:
+                content.commit_many(kind, items)
+                added += len(items)
+        if batch['bounds'] is not None:
+            board.content_changed(batch['bounds'])
+        replies.put({'id': batch_id, 'ok': True, 'added': added})
+        return False
+
+    def close(self):
+        self.listener.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def surface_bytes(surfaces):
+    return sum(surface.get_stride() * surface.get_height() for surface in surfaces)
+
+
+def format_bytes(size):
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+class MemoryBudget:
+    """
+    Accounts for the memory held by images, stroke data and render caches,
+    and keeps it under limit bytes. When over budget, layer surfaces that
+    are only drawn through a group composite are dropped first. Then the
+    least recently drawn images and stroke batches that are off screen are
+    evicted to a temporary directory, and read back as soon as something
+    draws them. Render caches whose size does not grow with the board are
+    reported but do not count toward the limit.
+    """
+
+    CHECK_INTERVAL = 5          # seconds
+    UNEVICTABLE = ("Layer surfaces", "Vector tiles", "Minimap and thumbnails")
+
+    def __init__(self, app, limit=MEMORY_BUDGET):
+        self.app = app
+        self.limit = limit
+        self.directory = None
+        self.spill_file = None      # geometry of evicted stroke batches
+        self.evictions = 0
+        GLib.timeout_add_seconds(self.CHECK_INTERVAL, self.check)
+
+    def resident_contents(self):
+        """Contents of the pages held in memory, the live one first."""
+        contents = [self.app.board.content]
+        pages = self.app.pages
+        if pages is not None:
+            contents += [page.content for page in pages.pages
+                         if page is not pages.active_page and page.state == 'resident']
+        return contents
+
+    def usage(self):
+        """(label, bytes) pairs of what is held in memory, and the bytes evicted to disk."""
+        contents = self.resident_contents()
+        layers = [layer for content in contents for layer in content.layers]
+        store = self.app.image_store
+        board = self.app.board
+
+        layer_surfaces = [layer.surface for layer in layers if layer.surface is not None]
+        layer_surfaces += [surface for key, surface in board.group_surfaces.values()]
+        previews = []
+        if self.app.minimap.raster is not None:
+            previews.append(self.app.minimap.raster)
+        if self.app.pages is not None:
+            previews += [page.thumbnail for page in self.app.pages.pages if page.thumbnail is not None]
+        tile_size = self.app.vector_store.TILE_SIZE
+
+        on_disk = self.spill_file.used_bytes() if self.spill_file is not None else 0
+        on_disk += sum(os.path.getsize(entry['path']) for entry in store.entries.values()
+                       if entry['pixbuf'] is None)
+        return [
+            ("Images", sum(store.pixel_bytes(key) for key in store.entries)),
+            ("Image surfaces", sum(store.surface_bytes(key) for key in store.entries)),
+            ("Strokes and items", sum(layer.item_bytes() for layer in layers)),
+            ("Batch paths", sum(layer.path_bytes() for layer in layers)),
+            ("Timeline history", sum(content.timeline.history_bytes() for content in contents)),
+            ("Layer surfaces", surface_bytes(layer_surfaces)),
+            ("Vector tiles", len(self.app.vector_store.tiles) * tile_size * tile_size * 4),
+            ("Minimap and thumbnails", surface_bytes(previews)),
+        ], on_disk
+
+    def check(self):
+        usage, on_disk = self.usage()
+        if sum(size for label, size in usage) > self.limit:
+            self.app.board.trim_caches()
+            usage, on_disk = self.usage()
+            excess = sum(size for label, size in usage if label not in self.UNEVICTABLE) - self.limit
+            if excess > 0:
+                self.evict(excess)
+        return True
+
+    def ensure_directory(self):
+        if self.directory is None:
+            self.directory = tempfile.mkdtemp(prefix="aboard-evicted-")
+            self.spill_file = SpillFile(os.path.join(self.directory, "batches.bin"))
+        return self.directory
+
+    def evict(self, excess):
+        """
+        Evict the least recently drawn off-screen items until excess bytes are
+        freed, starting with those only the timelines refer to.
+        """
+        board = self.app.board
+        visible = board.visible_world_rect()
+        live = board.content
+        store = self.app.image_store
+
+        on_screen = {img['key'] for layer in live.layers if layer.visible
+                     for img in layer.images if rects_intersect(image_bounds(img), visible)}
+        candidates = []             # (last used, bytes, image key or batch)
+        for key, entry in store.entries.items():
+            if entry['pixbuf'] is not None and key not in on_screen:
+                last_used = 0.0 if store.history_only(key) else entry['last_used']
+                candidates.append((last_used, store.pixel_bytes(key) + store.surface_bytes(key), key))
+        for content in self.resident_contents():
+            for layer in content.layers:
+                shown = content is live and layer.visible
+                for batch in layer.stroke_batches.batches:
+                    if batch.spilled is None and not (shown and rects_intersect(batch.bounds, visible)):
+                        candidates.append((batch.last_drawn, batch.geometry_bytes() + batch.path_bytes, batch))
+            for batch in content.timeline.archive:
+                if batch.spilled is None:
+                    candidates.append((0.0, batch.geometry_bytes(), batch))
+
+        directory = self.ensure_directory()
+        candidates.sort(key=lambda candidate: candidate[0])
+        for last_used, size, item in candidates:
+            if excess <= 0:
+                break
+            if isinstance(item, str):
+                store.evict(item, directory)
+            else:
+                item.spill(self.spill_file)
+            excess -= size
+            self.evictions += 1
+
+    def report(self):
+        """Usage breakdown for the About dialog."""
+        usage, on_disk = self.usage()
+        total = sum(size for label, size in usage if label not in self.UNEVICTABLE)
+        lines = [f"Memory: {format_bytes(total)} of {format_bytes(self.limit)}, "
+                 f"plus {format_bytes(sum(size for label, size in usage) - total)} of render caches"]
+        lines += [f"- {label}: {format_bytes(size)}" for label, size in usage]
+        lines.append(f"- Evicted to disk: {format_bytes(on_disk)} ({self.evictions} items)")
+        return "\n".join(lines)
+
+    def close(self):
+        if self.directory is not None:
+            shutil.rmtree(self.directory, ignore_errors=True)
+
 
 class WhiteboardApp(Gtk.Application):
     def __init__(self):
         super().__init__(application_id="com.example.whiteboard")
         self.connect("activate", self.on_activate)
+        self.connect("shutdown", self.on_shutdown)
         self.bg_color = (1.0, 1.0, 1.0)
         self.brush_color = (0.0, 0.0, 0.0)
         self.board = None
@@ -488,6 +3555,16 @@ class WhiteboardApp(Gtk.Application):
         self.current_tool = 'brush'  # 'brush', 'shape', 'text'
         self.current_shape_type = 'rect'  # 'rect', 'circle', 'triangle', 'arrow'
         self.window = None
+        self.image_store = ImageStore()
+        self.vector_store = VectorStore()
+        self.band_renderer = BandRenderer()
+        self.pages = None
+        self.memory = None
+        self.playback = None
+        self.ingest = None
+        self.icon_cache = {}        # (name, size, white, scale) -> pixbuf or None
+        self.icon_images = []       # (Gtk.Image, name, size, white) to reload on scale changes
+        self.fit_curves = True      # store committed strokes as fitted Bezier curves
 
         # Get the directory where the script is located
         self.script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -497,7 +3574,7 @@ class WhiteboardApp(Gtk.Application):
         return os.path.join(self.script_dir, "img", icon_name)
 
     def load_icon_white(self, icon_name, size=24):
-        """Load an icon and make it white."""
+        """Load an icon at size pixels and make it white."""
         icon_path = self.get_icon_path(icon_name)
         if os.path.exists(icon_path):
             try:
@@ -536,25 +3613,56 @@ class WhiteboardApp(Gtk.Application):
                 pass
         return None
 
+    def load_icon(self, icon_name, size=24, white=True, scale=1):
+        """Load an icon at size * scale pixels, made white if asked; cached per scale."""
+        key = (icon_name, size, white, scale)
+        if key not in self.icon_cache:
+            pixbuf = None
+            if white:
+                pixbuf = self.load_icon_white(icon_name, size * scale)
+            else:
+                icon_path = self.get_icon_path(icon_name)
+                if os.path.exists(icon_path):
+                    try:
+                        pixbuf = GdkPixbuf.Pixbuf.new_from_file_at_size(icon_path, size * scale, size * scale)
+                    except Exception:
+                        pixbuf = None
+            self.icon_cache[key] = pixbuf
+        return self.icon_cache[key]
+
+    def icon_image(self, icon_name, size=24, white=True):
+        """
+        A Gtk.Image of the icon rendered for the window's scale factor, or None
+        if it cannot be loaded. It is reloaded when the scale factor changes.
+        """
+        scale = self.window.get_scale_factor()
+        pixbuf = self.load_icon(icon_name, size, white, scale)
+        if pixbuf is None:
+            return None
+        image = Gtk.Image.new_from_surface(Gdk.cairo_surface_create_from_pixbuf(pixbuf, scale, None))
+        self.icon_images.append((image, icon_name, size, white))
+        return image
+
+    def on_scale_factor_changed(self, window, pspec):
+        """Re-render icons and page thumbnails for the new scale factor."""
+        scale = window.get_scale_factor()
+        for image, icon_name, size, white in self.icon_images:
+            pixbuf = self.load_icon(icon_name, size, white, scale)
+            if pixbuf is None:
+                continue            # keep the icon rendered for the previous scale
+            image.set_from_surface(Gdk.cairo_surface_create_from_pixbuf(pixbuf, scale, None))
+        if self.pages:
+            for page in self.pages.pages:
+                if page.state == 'resident' and page.thumbnail is not None:
+                    self.pages.update_thumbnail(page)
+
     def create_icon_button(self, icon_name, tooltip, callback=None, white_icon=True):
         """Create a button with an icon from the img folder."""
         button = Gtk.Button()
         button.set_tooltip_text(tooltip)
 
-        if white_icon:
-            pixbuf = self.load_icon_white(icon_name)
-        else:
-            icon_path = self.get_icon_path(icon_name)
-            if os.path.exists(icon_path):
-                try:
-                    pixbuf = GdkPixbuf.Pixbuf.new_from_file_at_size(icon_path, 24, 24)
-                except Exception:
-                    pixbuf = None
-            else:
-                pixbuf = None
-
-        if pixbuf:
-            image = Gtk.Image.new_from_pixbuf(pixbuf)
+        image = self.icon_image(icon_name, white=white_icon)
+        if image:
             button.set_image(image)
             button.set_always_show_image(True)
         else:
@@ -571,6 +3679,7 @@ class WhiteboardApp(Gtk.Application):
         win = Gtk.ApplicationWindow(application=app, title="aboard")
         win.set_default_size(1000, 700)
         self.window = win
+        win.connect("notify::scale-factor", self.on_scale_factor_changed)
 
         # Apply CSS for floating sidebar style with blur effect
         css_provider = Gtk.CssProvider()
@@ -655,6 +3764,32 @@ class WhiteboardApp(Gtk.Application):
         # Drawing area (full window)
         self.board = WhiteboardArea(self)
         overlay.add(self.board)
+        self.ink = InkOverlay(self.board)
+        overlay.add_overlay(self.ink)
+        overlay.set_overlay_pass_through(self.ink, True)
+        self.pages = PageManager(self, self.board)
+        budget = MEMORY_BUDGET
+        if os.environ.get("ABOARD_MEMORY_BUDGET"):
+            try:
+                budget = int(os.environ["ABOARD_MEMORY_BUDGET"]) * 1024 * 1024   # in megabytes
+            except ValueError:
+                print(f"Ignoring ABOARD_MEMORY_BUDGET={os.environ['ABOARD_MEMORY_BUDGET']!r}: "
+                      f"not a whole number of megabytes")
+        self.memory = MemoryBudget(self, budget)
+        socket_path = os.environ.get("ABOARD_SOCKET") or os.path.join(GLib.get_user_runtime_dir(),
+                                                                       f"aboard-{os.getpid()}.sock")
+        try:
+            self.ingest = IngestServer(self, socket_path)
+        except OSError as e:
+            print(f"Ingest socket unavailable at {socket_path}: {e}")
+
+        # Minimap (bottom right)
+        self.minimap = Minimap(self.board)
+        self.minimap.set_halign(Gtk.Align.END)
+        self.minimap.set_valign(Gtk.Align.END)
+        self.minimap.set_margin_end(15)
+        self.minimap.set_margin_bottom(15)
+        overlay.add_overlay(self.minimap)
 
         # Enable drag and drop for images
         self.board.drag_dest_set(
@@ -769,6 +3904,33 @@ class WhiteboardApp(Gtk.Application):
         clear_btn.connect("clicked", self.on_clear)
         self.sidebar.pack_start(clear_btn, False, False, 0)
 
+        # Pages button with thumbnail popup
+        pages_btn = Gtk.Button()
+        pages_btn.set_tooltip_text("Pages")
+        pages_btn.set_label("PG")
+        self.pages_popover = Gtk.Popover()
+        self.pages_popover.set_relative_to(pages_btn)
+        self.pages_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=4)
+        self.pages_box.get_style_context().add_class("shape-menu")
+        self.pages_popover.add(self.pages_box)
+        pages_btn.connect("clicked", self.on_show_pages)
+        self.sidebar.pack_start(pages_btn, False, False, 0)
+
+        # Layers button with layer list popup
+        layers_btn = Gtk.Button()
+        layers_btn.set_tooltip_text("Layers")
+        layers_btn.set_label("LY")
+        self.layers_popover = Gtk.Popover()
+        self.layers_popover.set_relative_to(layers_btn)
+        self.layers_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=4)
+        self.layers_box.set_margin_top(8)
+        self.layers_box.set_margin_bottom(8)
+        self.layers_box.set_margin_start(8)
+        self.layers_box.set_margin_end(8)
+        self.layers_popover.add(self.layers_box)
+        layers_btn.connect("clicked", lambda b: (self.refresh_layers(), self.layers_popover.popup()))
+        self.sidebar.pack_start(layers_btn, False, False, 0)
+
         sidebar_container.pack_start(self.sidebar, False, False, 0)
         overlay.add_overlay(sidebar_container)
 
@@ -781,9 +3943,8 @@ class WhiteboardApp(Gtk.Application):
         menu_btn.get_style_context().add_class("menu-button")
 
         # Set menu icon (white)
-        menu_pixbuf = self.load_icon_white("menu-symbolic.svg", 20)
-        if menu_pixbuf:
-            menu_image = Gtk.Image.new_from_pixbuf(menu_pixbuf)
+        menu_image = self.icon_image("menu-symbolic.svg", 20)
+        if menu_image:
             menu_btn.set_image(menu_image)
 
         # Menu popup
@@ -793,6 +3954,19 @@ class WhiteboardApp(Gtk.Application):
         toggle_sidebar_item.connect("activate", self.on_toggle_sidebar)
         menu.append(toggle_sidebar_item)
 
+        toggle_minimap_item = Gtk.MenuItem(label="Toggle Minimap")
+        toggle_minimap_item.connect("activate", self.on_toggle_minimap)
+        menu.append(toggle_minimap_item)
+
+        fit_curves_item = Gtk.CheckMenuItem(label="Fit Strokes to Curves")
+        fit_curves_item.set_active(self.fit_curves)
+        fit_curves_item.connect("toggled", self.on_toggle_fit_curves)
+        menu.append(fit_curves_item)
+
+        replay_item = Gtk.MenuItem(label="Replay Session")
+        replay_item.connect("activate", self.on_start_playback)
+        menu.append(replay_item)
+
         about_item = Gtk.MenuItem(label="About")
         about_item.connect("activate", self.on_about)
         menu.append(about_item)
@@ -802,18 +3976,101 @@ class WhiteboardApp(Gtk.Application):
 
         overlay.add_overlay(menu_btn)
 
+        # Text search box (top center), toggled with Ctrl+F
+        self.search_revealer = Gtk.Revealer()
+        self.search_revealer.set_halign(Gtk.Align.CENTER)
+        self.search_revealer.set_valign(Gtk.Align.START)
+        self.search_revealer.set_margin_top(15)
+
+        search_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=4)
+        search_box.get_style_context().add_class("floating-sidebar")
+
+        self.search_entry = Gtk.SearchEntry()
+        self.search_entry.set_placeholder_text("Find text...")
+        self.search_entry.set_width_chars(30)
+        self.search_entry.connect("search-changed", self.on_search_changed)
+        self.search_entry.connect("activate", self.on_search_activate)
+        self.search_entry.connect("stop-search", lambda e: self.hide_search())
+        search_box.pack_start(self.search_entry, False, False, 0)
+
+        self.search_results = Gtk.ListBox()
+        self.search_results.connect("row-activated", self.on_search_result_activated)
+        results_scroll = Gtk.ScrolledWindow()
+        results_scroll.set_policy(Gtk.PolicyType.NEVER, Gtk.PolicyType.AUTOMATIC)
+        results_scroll.set_max_content_height(300)
+        results_scroll.set_propagate_natural_height(True)
+        results_scroll.add(self.search_results)
+        search_box.pack_start(results_scroll, False, False, 0)
+
+        self.search_revealer.add(search_box)
+        overlay.add_overlay(self.search_revealer)
+
+        # Session playback controls (bottom center)
+        self.playback_revealer = Gtk.Revealer()
+        self.playback_revealer.set_halign(Gtk.Align.CENTER)
+        self.playback_revealer.set_valign(Gtk.Align.END)
+        self.playback_revealer.set_margin_bottom(15)
+
+        playback_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=6)
+        playback_box.get_style_context().add_class("floating-sidebar")
+
+        self.play_btn = Gtk.Button(label="Play")
+        self.play_btn.connect("clicked", self.on_toggle_play)
+        playback_box.pack_start(self.play_btn, False, False, 0)
+
+        self.playback_scale = Gtk.Scale.new_with_range(Gtk.Orientation.HORIZONTAL, 0, 1, 0.1)
+        self.playback_scale.set_size_request(360, -1)
+        self.playback_scale.set_draw_value(False)
+        self.playback_scale_handler = self.playback_scale.connect("value-changed", self.on_playback_scrub)
+        playback_box.pack_start(self.playback_scale, True, True, 0)
+
+        self.playback_speed = Gtk.ComboBoxText()
+        for speed in Playback.SPEEDS:
+            self.playback_speed.append(str(speed), f"{speed}x")
+        self.playback_speed.set_active(0)
+        self.playback_speed.connect("changed", self.on_playback_speed)
+        playback_box.pack_start(self.playback_speed, False, False, 0)
+
+        done_btn = Gtk.Button(label="Done")
+        done_btn.connect("clicked", lambda b: self.stop_playback())
+        playback_box.pack_start(done_btn, False, False, 0)
+
+        self.playback_revealer.add(playback_box)
+        overlay.add_overlay(self.playback_revealer)
+
         # Connect key press for paste (Ctrl+V)
         win.connect("key-press-event", self.on_key_press)
 
         win.show_all()
+        # Deliver every pen sample instead of one merged event per frame
+        win.get_window().set_event_compression(False)
 
     def on_key_press(self, widget, event):
-        """Handle key press events for paste functionality."""
+        """Handle key press events for paste, search and page shortcuts."""
+        # Let the search entry handle its own editing keys
+        if self.search_entry.has_focus():
+            if event.keyval == Gdk.KEY_Escape:
+                self.hide_search()
+                return Gdk.EVENT_STOP
+            return Gdk.EVENT_PROPAGATE
+
         # Check for Ctrl+V
         if event.state & Gdk.ModifierType.CONTROL_MASK:
+            if event.keyval == Gdk.KEY_f or event.keyval == Gdk.KEY_F:
+                self.show_search()
+                return Gdk.EVENT_STOP
             if event.keyval == Gdk.KEY_v or event.keyval == Gdk.KEY_V:
                 self.paste_from_clipboard()
                 return Gdk.EVENT_STOP
+            # Ctrl+PageUp / Ctrl+PageDown switch pages
+            if event.keyval == Gdk.KEY_Page_Up:
+                self.stop_playback()
+                self.pages.activate(self.pages.active - 1)
+                return Gdk.EVENT_STOP
+            if event.keyval == Gdk.KEY_Page_Down:
+                self.stop_playback()
+                self.pages.activate(self.pages.active + 1)
+                return Gdk.EVENT_STOP
         return Gdk.EVENT_PROPAGATE
 
     def paste_from_clipboard(self):
@@ -840,16 +4097,242 @@ class WhiteboardApp(Gtk.Application):
                     import urllib.parse
                     filepath = urllib.parse.unquote(filepath)
 
+                    wx, wy = self.board.screen_to_world(x, y)
+                    if os.path.splitext(filepath)[1].lower() in (".svg", ".pdf"):
+                        try:
+                            self.board.add_vector(filepath, wx, wy)
+                            continue
+                        except Exception as e:
+                            # Fall back to a raster import where possible
+                            print(f"Failed to load vector file: {e}")
+
                     try:
                         pixbuf = GdkPixbuf.Pixbuf.new_from_file(filepath)
                         if pixbuf:
-                            wx, wy = self.board.screen_to_world(x, y)
                             self.board.add_image(pixbuf, wx, wy)
                     except Exception as e:
                         print(f"Failed to load image: {e}")
 
+    def show_search(self):
+        self.search_revealer.set_reveal_child(True)
+        self.search_entry.grab_focus()
+        self.on_search_changed(self.search_entry)
+
+    def hide_search(self):
+        self.search_revealer.set_reveal_child(False)
+        self.board.grab_focus()
+
+    def on_search_changed(self, entry):
+        """Refresh the result list, nearest matches to the viewport first."""
+        for row in self.search_results.get_children():
+            self.search_results.remove(row)
+
+        content = self.board.content
+        results = content.text_index.search(entry.get_text(), self.board.visible_world_rect())
+        # Text on hidden or locked layers is listed but can't be deleted
+        frozen = {id(t) for layer in content.layers if not layer.editable for t in layer.text_items} if results else set()
+        for text_item in results:
+            row = Gtk.ListBoxRow()
+            row.text_item = text_item
+            row_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=4)
+
+            label = Gtk.Label(label=text_item['text'], xalign=0)
+            label.set_ellipsize(Pango.EllipsizeMode.END)
+            label.set_max_width_chars(40)
+            row_box.pack_start(label, True, True, 0)
+
+            delete_btn = Gtk.Button(label="\u00d7")
+            delete_btn.set_tooltip_text("Delete Text")
+            delete_btn.set_relief(Gtk.ReliefStyle.NONE)
+            delete_btn.set_sensitive(id(text_item) not in frozen)
+            delete_btn.connect("clicked", self.on_search_result_deleted, text_item)
+            row_box.pack_start(delete_btn, False, False, 0)
+
+            row.add(row_box)
+            self.search_results.add(row)
+        self.search_results.show_all()
+
+    def on_search_activate(self, entry):
+        row = self.search_results.get_row_at_index(0)
+        if row is not None:
+            self.on_search_result_activated(self.search_results, row)
+
+    def on_search_result_activated(self, listbox, row):
+        """Glide the camera to the chosen text item."""
+        text_item = row.text_item
+        x0, y0, x1, y1 = text_bounds(text_item)
+        self.board.animate_view((x0 + x1) / 2, (y0 + y1) / 2, max(self.board.zoom, 1.0))
+
+    def on_search_result_deleted(self, button, text_item):
+        if self.board.content.remove_text_item(text_item):
+            self.board.content_changed(text_bounds(text_item))
+            self.on_search_changed(self.search_entry)
+
+    def on_show_pages(self, button):
+        """Rebuild the page list from the cached thumbnails and show it."""
+        for child in self.pages_box.get_children():
+            self.pages_box.remove(child)
+
+        # The active page changes while edited, so its thumbnail is redrawn here
+        self.pages.update_thumbnail(self.pages.active_page)
+
+        for index, page in enumerate(self.pages.pages):
+            btn = Gtk.Button()
+            btn.set_tooltip_text(page.name)
+            if page.thumbnail is not None:
+                btn.set_image(Gtk.Image.new_from_surface(page.thumbnail))
+                btn.set_always_show_image(True)
+            else:
+                btn.set_label(page.name)
+            if index == self.pages.active:
+                btn.get_style_context().add_class("active")
+            btn.connect("clicked", self.on_select_page, index)
+            self.pages_box.pack_start(btn, False, False, 0)
+
+        add_btn = Gtk.Button(label="+")
+        add_btn.set_tooltip_text("New Page")
+        add_btn.connect("clicked", self.on_add_page)
+        self.pages_box.pack_start(add_btn, False, False, 0)
+
+        self.pages_box.show_all()
+        self.pages_popover.popup()
+
+    def on_select_page(self, button, index):
+        self.pages_popover.popdown()
+        self.stop_playback()
+        self.pages.activate(index)
+
+    def on_add_page(self, button):
+        self.pages_popover.popdown()
+        self.stop_playback()
+        self.pages.add_page()
+
+    def on_start_playback(self, item):
+        """Replay the current page from its first operation."""
+        if self.playback is not None:
+            return
+        self.playback = Playback(self.board, self.on_playback_tick)
+        self.playback.speed = Playback.SPEEDS[self.playback_speed.get_active()]
+        self.playback_scale.set_range(0, max(self.playback.end - self.playback.start, 0.1))
+        self.on_playback_tick(self.playback)
+        self.playback_revealer.set_reveal_child(True)
+        self.playback.play()
+        self.play_btn.set_label("Pause")
+
+    def stop_playback(self):
+        if self.playback is None:
+            return
+        self.playback.close()
+        self.playback = None
+        self.playback_revealer.set_reveal_child(False)
+
+    def on_toggle_play(self, button):
+        if self.playback.playing:
+            self.playback.pause()
+        else:
+            self.playback.play()
+        button.set_label("Pause" if self.playback.playing else "Play")
+
+    def on_playback_tick(self, playback):
+        """Move the slider along without seeking again."""
+        with self.playback_scale.handler_block(self.playback_scale_handler):
+            self.playback_scale.set_value(playback.time - playback.start)
+        if not playback.playing:
+            self.play_btn.set_label("Play")
+
+    def on_playback_scrub(self, scale):
+        if self.playback is not None:
+            self.playback.seek(self.playback.start + scale.get_value())
+
+    def on_playback_speed(self, combo):
+        if self.playback is not None:
+            self.playback.speed = Playback.SPEEDS[combo.get_active()]
+
+    def refresh_layers(self):
+        """Rebuild the layer list, top layer first."""
+        for child in self.layers_box.get_children():
+            self.layers_box.remove(child)
+
+        content = self.board.content
+        group = None
+        for index in reversed(range(len(content.layers))):
+            layer = content.layers[index]
+            row = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=4)
+
+            select_btn = Gtk.RadioButton.new_with_label_from_widget(group, layer.name)
+            group = group or select_btn
+            select_btn.set_active(index == content.active)
+            select_btn.connect("toggled", self.on_select_layer, index)
+            row.pack_start(select_btn, True, True, 0)
+
+            visible_btn = Gtk.CheckButton(label="Visible")
+            visible_btn.set_active(layer.visible)
+            visible_btn.connect("toggled", self.on_toggle_layer_visible, layer)
+            row.pack_start(visible_btn, False, False, 0)
+
+            lock_btn = Gtk.CheckButton(label="Locked")
+            lock_btn.set_active(layer.locked)
+            lock_btn.connect("toggled", self.on_toggle_layer_locked, layer)
+            row.pack_start(lock_btn, False, False, 0)
+
+            self.layers_box.pack_start(row, False, False, 0)
+
+        actions = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=4)
+        for label, tooltip, callback in (
+            ("+", "New Layer", self.on_add_layer),
+            ("\u2191", "Move Layer Up", lambda b: self.on_move_layer(1)),
+            ("\u2193", "Move Layer Down", lambda b: self.on_move_layer(-1)),
+            ("\u2212", "Delete Layer", self.on_remove_layer),
+        ):
+            btn = Gtk.Button(label=label)
+            btn.set_tooltip_text(tooltip)
+            btn.connect("clicked", callback)
+            actions.pack_start(btn, True, True, 0)
+        self.layers_box.pack_start(actions, False, False, 0)
+
+        self.layers_box.show_all()
+
+    def on_select_layer(self, button, index):
+        if button.get_active():
+            self.board.content.active = index
+            self.board.queue_draw()
+
+    def on_toggle_layer_visible(self, button, layer):
+        layer.visible = button.get_active()
+        self.board.content_changed()
+
+    def on_toggle_layer_locked(self, button, layer):
+        layer.locked = button.get_active()
+
+    def on_add_layer(self, button):
+        self.board.content.add_layer()
+        self.refresh_layers()
+        self.board.queue_draw()
+
+    def on_move_layer(self, delta):
+        content = self.board.content
+        content.move_layer(content.active, delta)
+        self.refresh_layers()
+        self.board.content_changed()
+
+    def on_remove_layer(self, button):
+        content = self.board.content
+        content.remove_layer(content.active, self.image_store)
+        self.refresh_layers()
+        self.board.content_changed()
+
+    def on_shutdown(self, app):
+        if self.pages:
+            self.pages.close()
+        if self.memory:
+            self.memory.close()
+        if self.ingest:
+            self.ingest.close()
+        self.band_renderer.shutdown()
+
     def on_clear(self, button):
         if self.board:
+            self.stop_playback()
             self.board.clear()
 
     def on_select_brush(self, button):
@@ -975,10 +4458,10 @@ class WhiteboardApp(Gtk.Application):
 
         # Update eraser strokes color to match new background
         if self.board:
-            for stroke in self.board.strokes:
+            for stroke in self.board.content.iter_strokes():
                 if stroke.get('is_eraser', False):
                     stroke['color'] = self.bg_color
-            self.board.queue_draw()
+            self.board.content_changed()
 
     def on_toggle_sidebar(self, item):
         self.sidebar_visible = not self.sidebar_visible
@@ -987,6 +4470,12 @@ class WhiteboardApp(Gtk.Application):
         else:
             self.sidebar.hide()
 
+    def on_toggle_fit_curves(self, item):
+        self.fit_curves = item.get_active()
+
+    def on_toggle_minimap(self, item):
+        self.minimap.set_visible(not self.minimap.get_visible())
+
     def on_about(self, item):
         dialog = Gtk.MessageDialog(
             transient_for=self.get_active_window(),
@@ -1002,13 +4491,21 @@ class WhiteboardApp(Gtk.Application):
             "- Right click + drag: Pan\n"
             "- Mouse wheel: Zoom\n"
             "- Ctrl+V: Paste image\n"
+            "- Ctrl+F: Find text\n"
+            "- Ctrl+PageUp/PageDown: Switch page\n"
             "- Drag & drop: Add image\n"
-            "- Use toolbar for tools"
+            "- Use toolbar for tools\n\n"
+            + (f"Ingest socket: {self.ingest.path}\n\n" if self.ingest else "")
+            + self.memory.report() + "\n\n"
+            + self.ink.report()
         )
         dialog.run()
         dialog.destroy()
 
 
 if __name__ == "__main__":
-    app = WhiteboardApp()
-    app.run()
+    if "--benchmark" in sys.argv:
+        benchmark()
+    else:
+        app = WhiteboardApp()
+        app.run()